@@ -0,0 +1,114 @@
+import asyncio
+import itertools
+import discord
+
+_ids = itertools.count(1_000_000)
+
+
+class FakeUser:
+    def __init__(self, user_id, name):
+        self.id = user_id
+        self.name = name
+        self.bot = False
+        self.mention = f"<@{user_id}>"
+
+    def __str__(self):
+        return self.name
+
+
+class FakeChannel:
+    def __init__(self, channel_id):
+        self.id = channel_id
+        self.name = "bench"
+        self.sent = 0
+        self.edits = 0
+        self.deletes = 0
+
+    async def send(self, content=None, **kwargs):
+        self.sent += 1
+        return FakeMessage(self, content)
+
+    async def delete_messages(self, messages):
+        self.deletes += 1
+
+    def get_partial_message(self, message_id):
+        return FakeMessage(self, None, message_id)
+
+
+class FakeMessage:
+    def __init__(self, channel, content, message_id=None):
+        self.id = message_id or next(_ids)
+        self.channel = channel
+        self.content = content
+        self.pinned = False
+        self.context = None  # the FakeContext that sent it, answers prompts added by an edit
+
+    async def edit(self, **kwargs):
+        self.channel.edits += 1
+        self.content = kwargs.get("content", self.content)
+        # Progress messages put their prompt buttons on the existing message
+        if self.context is not None and kwargs.get("view") is not None:
+            self.context._answer(kwargs["view"])
+        return self
+
+    async def delete(self):
+        self.channel.deletes += 1
+
+
+class FakeInteractionResponse:
+    async def defer(self):
+        pass
+
+    async def send_message(self, content=None, **kwargs):
+        pass
+
+
+class FakeInteraction:
+    # A button click, routed through the bot's InteractionDispatcher
+    type = discord.InteractionType.component
+
+    def __init__(self, custom_id, user):
+        self.data = {"custom_id": custom_id}
+        self.user = user
+        self.response = FakeInteractionResponse()
+
+
+class FakeContext:
+    # Enough of commands.Context to call the command handlers directly. Prompts
+    # are answered with the first button whose choice is in answers, after
+    # answer_delay seconds, the way a user would click it.
+    def __init__(self, user, channel, dispatcher, answers=("start", "shutdown"), answer_delay=0.0):
+        self.author = user
+        self.channel = channel
+        self.dispatcher = dispatcher
+        self.answers = answers
+        self.answer_delay = answer_delay
+        self.message = FakeMessage(channel, "!bench")
+        self.interaction = None
+        self.command = None
+        self.sent = 0
+        self._answered = set()  # custom ids already clicked, a view is seen again on every edit
+
+    async def defer(self, **kwargs):
+        pass
+
+    async def send(self, content=None, view=None, **kwargs):
+        self.sent += 1
+        message = await self.channel.send(content, view=view, **kwargs)
+        message.context = self
+        if view is not None:
+            self._answer(view)
+        return message
+
+    def _answer(self, view):
+        for answer in self.answers:
+            for item in view.children:
+                custom_id = getattr(item, "custom_id", None) or ""
+                if custom_id in self._answered:
+                    continue
+                if custom_id.endswith(f":{answer}"):
+                    self._answered.add(custom_id)
+                    asyncio.get_running_loop().call_later(
+                        self.answer_delay,
+                        lambda: asyncio.ensure_future(self.dispatcher.dispatch(FakeInteraction(custom_id, self.author))))
+                    return
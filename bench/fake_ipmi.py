@@ -0,0 +1,102 @@
+import asyncio
+import threading
+import time
+
+
+class FakeChassisStatus:
+    def __init__(self, power_on):
+        self.power_on = power_on
+
+
+class FakeSession:
+    def close(self):
+        pass
+
+
+class FakeIpmiConnection:
+    # The part of a pyipmi connection the bot uses. Calls run on IpmiService's
+    # worker threads and block for latency seconds, like a real BMC round trip.
+    def __init__(self, bmc):
+        self.bmc = bmc
+        self.session = FakeSession()
+
+    def get_chassis_status(self):
+        self.bmc.count('get_chassis_status')
+        time.sleep(self.bmc.latency)
+        return FakeChassisStatus(self.bmc.power_on)
+
+    def chassis_control(self, command):
+        self.bmc.count('chassis_control')
+        time.sleep(self.bmc.latency)
+        self.bmc.control(command)
+
+
+class FakeBmc:
+    # Stands in for the BMC behind the real IpmiService: install() replaces only
+    # its _connect, so the service's executor, status cache, timeouts and
+    # reconnects all run under the bench. Powering on brings the fake Proxmox
+    # API up after boot_time seconds, powering off takes it down after
+    # shutdown_time seconds.
+    def __init__(self, proxmox, latency=0.05, boot_time=2.0, shutdown_time=1.0):
+        self.proxmox = proxmox
+        self.latency = latency
+        self.boot_time = boot_time
+        self.shutdown_time = shutdown_time
+        self.power_on = proxmox.powered
+        self.calls = {}  # command -> count
+        self.connects = 0
+        self._lock = threading.Lock()
+        self._loop = None
+        self._transition = None
+
+    def install(self, ipmi):
+        self._loop = asyncio.get_running_loop()
+        ipmi._connect = self.connect
+
+    def connect(self):
+        # Runs on the service's worker thread, like the real session setup
+        with self._lock:
+            self.connects += 1
+        time.sleep(self.latency)
+        return FakeIpmiConnection(self)
+
+    def count(self, method):
+        with self._lock:
+            self.calls[method] = self.calls.get(method, 0) + 1
+
+    def reset_counters(self):
+        self.calls = {}
+        self.connects = 0
+
+    def total_calls(self):
+        return sum(self.calls.values())
+
+    def set_power(self, power_on):
+        # Sets the host state directly, for preparing a scenario
+        if self._transition is not None:
+            self._transition.cancel()
+            self._transition = None
+        self.power_on = power_on
+        self.proxmox.powered = power_on
+
+    def control(self, command):
+        # Worker thread side, the fake Proxmox API is switched on the event loop
+        if command == 1 and not self.power_on:
+            self.power_on = True
+            self._loop.call_soon_threadsafe(self._after, self.boot_time, True)
+        elif command in (0, 5) and self.power_on:
+            self.power_on = False
+            self._loop.call_soon_threadsafe(self._after, self.shutdown_time, False)
+
+    def _after(self, delay, powered):
+        async def switch():
+            await asyncio.sleep(delay)
+            self.proxmox.powered = powered
+
+        if self._transition is not None:
+            self._transition.cancel()
+        self._transition = asyncio.ensure_future(switch())
+
+    def close(self):
+        if self._transition is not None:
+            self._transition.cancel()
@@ -0,0 +1,136 @@
+import asyncio
+import itertools
+import random
+import time
+from aiohttp import web
+
+
+class FakeProxmox:
+    # Local stand-in for the parts of the Proxmox API the bot uses. Every
+    # request waits latency (+/- jitter) seconds, failure_rate of them answer
+    # with a 500, and nothing answers at all while the host is powered off.
+    def __init__(self, nodes=("pve",), latency=0.02, jitter=0.01, failure_rate=0.0, task_duration=0.5):
+        self.nodes = list(nodes)
+        self.latency = latency
+        self.jitter = jitter
+        self.failure_rate = failure_rate
+        self.task_duration = task_duration
+        self.powered = True
+        self.vms = {}  # vm_id -> {"node": node, "status": status}
+        self.tasks = {}  # upid -> {"finish_at": time, "vm_id": vm_id, "status": target status}
+        self.requests = {}  # "METHOD endpoint" -> count
+        self._task_ids = itertools.count(1)
+        self._runner = None
+        self.port = None
+
+    def add_vm(self, vm_id, node=None, status="stopped"):
+        self.vms[str(vm_id)] = {"node": node or self.nodes[0], "status": status}
+
+    def set_all(self, status):
+        for vm in self.vms.values():
+            vm["status"] = status
+
+    def reset_counters(self):
+        self.requests = {}
+
+    def total_requests(self):
+        return sum(self.requests.values())
+
+    @property
+    def base_url(self):
+        return f"http://127.0.0.1:{self.port}/api2/json"
+
+    async def start(self, port=0):
+        app = web.Application(middlewares=[self._middleware])
+        app.router.add_get("/api2/json/nodes/{node}/status", self._node_status)
+        app.router.add_get("/api2/json/nodes/{node}/qemu", self._node_vms)
+        app.router.add_get("/api2/json/nodes/{node}/qemu/{vmid}/status/current", self._vm_status)
+        app.router.add_post("/api2/json/nodes/{node}/qemu/{vmid}/status/{action}", self._vm_action)
+        app.router.add_get("/api2/json/nodes/{node}/tasks/{upid}/status", self._task_status)
+        app.router.add_get("/api2/json/cluster/resources", self._cluster_resources)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, "127.0.0.1", port)
+        await site.start()
+        self.port = site._server.sockets[0].getsockname()[1]
+
+    async def stop(self):
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+    @web.middleware
+    async def _middleware(self, request, handler):
+        route = request.match_info.route.resource.canonical if request.match_info.route.resource else request.path
+        key = f"{request.method} {route.replace('/api2/json', '')}"
+        self.requests[key] = self.requests.get(key, 0) + 1
+
+        if not self.powered:
+            # An off host never answers, drop the connection
+            request.transport.close()
+            raise web.HTTPServiceUnavailable()
+        await asyncio.sleep(max(0.0, self.latency + random.uniform(-self.jitter, self.jitter)))
+        if self.failure_rate and random.random() < self.failure_rate:
+            return web.json_response({"data": None, "errors": "injected failure"}, status=500)
+        self._finish_tasks()
+        return await handler(request)
+
+    def _finish_tasks(self):
+        now = time.monotonic()
+        for task in self.tasks.values():
+            if task["status"] == "running" and now >= task["finish_at"]:
+                task["status"] = "stopped"
+                vm = self.vms.get(task["vm_id"])
+                if vm is not None:
+                    vm["status"] = task["target"]
+
+    def _vm(self, request):
+        vm = self.vms.get(request.match_info["vmid"])
+        if vm is None or vm["node"] != request.match_info["node"]:
+            raise web.HTTPInternalServerError(
+                text=f"Configuration file 'nodes/{request.match_info['node']}/qemu-server/"
+                     f"{request.match_info['vmid']}.conf' does not exist")
+        return vm
+
+    async def _node_status(self, request):
+        if request.match_info["node"] not in self.nodes:
+            raise web.HTTPNotFound()
+        return web.json_response({"data": {"idle": 0, "uptime": 1000, "cpu": 0.01}})
+
+    async def _node_vms(self, request):
+        node = request.match_info["node"]
+        return web.json_response({"data": [{"vmid": int(vm_id), "status": vm["status"]}
+                                           for vm_id, vm in self.vms.items() if vm["node"] == node]})
+
+    async def _vm_status(self, request):
+        vm = self._vm(request)
+        return web.json_response({"data": {"vmid": int(request.match_info["vmid"]), "status": vm["status"]}})
+
+    async def _vm_action(self, request):
+        self._vm(request)
+        node = request.match_info["node"]
+        vm_id = request.match_info["vmid"]
+        action = request.match_info["action"]
+        upid = f"UPID:{node}:{next(self._task_ids):08X}:00000000:{int(time.time()):08X}:qm{action}:{vm_id}:bench@pve:"
+        self.tasks[upid] = {
+            "finish_at": time.monotonic() + self.task_duration,
+            "vm_id": vm_id,
+            "status": "running",
+            "target": "running" if action == "start" else "stopped",
+        }
+        return web.json_response({"data": upid})
+
+    async def _task_status(self, request):
+        task = self.tasks.get(request.match_info["upid"])
+        if task is None:
+            raise web.HTTPNotFound()
+        body = {"status": task["status"]}
+        if task["status"] == "stopped":
+            body["exitstatus"] = "OK"
+        return web.json_response({"data": body})
+
+    async def _cluster_resources(self, request):
+        return web.json_response({"data": [
+            {"id": f"qemu/{vm_id}", "type": "qemu", "vmid": int(vm_id), "node": vm["node"], "status": vm["status"]}
+            for vm_id, vm in self.vms.items()
+        ]})
@@ -0,0 +1,87 @@
+import argparse
+import asyncio
+import json
+import math
+import os
+import sys
+import time
+
+# Run from anywhere, the service lives in the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ipmi_service import IpmiService
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[max(0, min(len(ordered) - 1, math.ceil(fraction * len(ordered)) - 1))] if ordered else 0.0
+
+
+def cpu_seconds():
+    # This process plus the ipmitool children it waited for
+    times = os.times()
+    return times.user + times.system + times.children_user + times.children_system
+
+
+async def bench_transport(ipmi_config, transport, count, method):
+    ipmi = IpmiService(ipmi_config.get("host", ""), ipmi_config.get("port", 623), ipmi_config.get("username", ""),
+                       ipmi_config.get("password", ""), timeout=ipmi_config.get("timeout", 10), transport=transport)
+    try:
+        # The first call opens the session, it is reported separately
+        started = time.monotonic()
+        await ipmi.call(method)
+        connect = time.monotonic() - started
+
+        latencies = []
+        cpu_before = cpu_seconds()
+        wall_before = time.monotonic()
+        for _ in range(count):
+            started = time.monotonic()
+            await ipmi.call(method)
+            latencies.append(time.monotonic() - started)
+        wall = time.monotonic() - wall_before
+        cpu = cpu_seconds() - cpu_before
+    finally:
+        ipmi.close()
+
+    return {
+        "transport": transport,
+        "connect": connect,
+        "p50": percentile(latencies, 0.50),
+        "p95": percentile(latencies, 0.95),
+        "p99": percentile(latencies, 0.99),
+        "calls_per_second": count / wall if wall else 0.0,
+        "cpu_ms_per_call": cpu / count * 1000,
+    }
+
+
+async def run(args):
+    with open(args.config_file, 'r') as config_file:
+        ipmi_config = json.load(config_file).get("ipmi", {})
+    results = []
+    for transport in args.transports:
+        try:
+            results.append(await bench_transport(ipmi_config, transport, args.count, args.method))
+        except Exception as e:
+            print(f"{transport}: failed: {type(e).__name__}: {e}")
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare IPMI transports against the BMC from the bot config.')
+    parser.add_argument('--config-file', default='config.json', help='Bot config with the ipmi section to use')
+    parser.add_argument('--count', type=int, default=50, help='Calls per transport')
+    parser.add_argument('--method', default='get_chassis_status', help='Read-only pyipmi method to call')
+    parser.add_argument('--transports', nargs='+', default=list(IpmiService.TRANSPORTS), choices=IpmiService.TRANSPORTS)
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args))
+    print(f"{'transport':<10}{'connect ms':>12}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'calls/s':>10}{'cpu ms/call':>13}")
+    for result in results:
+        print(f"{result['transport']:<10}{result['connect'] * 1000:>12.1f}{result['p50'] * 1000:>10.1f}"
+              f"{result['p95'] * 1000:>10.1f}{result['p99'] * 1000:>10.1f}{result['calls_per_second']:>10.1f}"
+              f"{result['cpu_ms_per_call']:>13.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,265 @@
+import argparse
+import asyncio
+import json
+import math
+import os
+import sys
+import tempfile
+import time
+
+# The bench drives the bot module directly, run it from anywhere
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import main as bot_main
+import host_lifecycle
+from fake_proxmox import FakeProxmox
+from fake_ipmi import FakeBmc
+from fake_discord import FakeUser, FakeChannel, FakeContext
+
+CHANNEL_ID = 4242
+NODE = "pve"
+
+
+def bench_config(args, fake_proxmox, workdir):
+    mapping = {}
+    for user in range(args.users):
+        vm_ids = [str(100 + user * args.vms_per_user + index) for index in range(args.vms_per_user)]
+        mapping[str(1000 + user)] = vm_ids if args.vms_per_user > 1 else vm_ids[0]
+    return {
+        "discord": {
+            "token": "bench",
+            "channel_id": str(CHANNEL_ID),
+            "delete_messages": False,
+            "clear_channel": False,
+            "slash_commands": False,
+            "report_interval": 0,
+            "config_reload_interval": 0,
+            "discord_to_vm_mapping": mapping,
+        },
+        "ipmi": {"host": "127.0.0.1", "status_ttl": args.ipmi_status_ttl},
+        "proxmox": {
+            "base_url": fake_proxmox.base_url,
+            "token": "bench",
+            "username": "bench",
+            "realm": "pve",
+            "token_name": "bench",
+            "node_name": NODE,
+            "startup_time": 60,
+            "ready_poll_initial": 0.2,
+            "ready_poll_max": 1,
+            "boot_history_file": os.path.join(workdir, "boot_history.json"),
+            "timeout": 5,
+            "task_poll_min": 0.1,
+            "task_poll_max": 0.5,
+        },
+        "watcher": {"enabled": args.watcher, "fast_interval": 1, "slow_interval": 5},
+        "metrics": {"enabled": False},
+    }
+
+
+def percentile(values, fraction):
+    # Nearest-rank percentile
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, math.ceil(fraction * len(ordered)) - 1))
+    return ordered[index]
+
+
+# name -> (host powered, VM state before the run, prompt answers, handler,
+#          VM state every mapped VM must reach or None, host power afterwards or None,
+#          IPMI power commands the whole run must send or None)
+SCENARIOS = {
+    "serverstatus": (True, "stopped", ("start", "shutdown"), lambda ctx: bot_main.server_status_command.callback(ctx),
+                     None, None, None),
+    "startvm": (True, "stopped", ("start",), lambda ctx: bot_main.start_vm_command.callback(ctx), "running", None, None),
+    "stopvm": (True, "running", ("shutdown",), lambda ctx: bot_main.stop_vm_command.callback(ctx), "stopped", None, None),
+    "vmlist": (True, "stopped", (), lambda ctx: bot_main.vm_list_command.callback(ctx), None, None, None),
+    # Every user asks at once, one soft off must go out and the rest be refused
+    "poweroff": (True, "stopped", (), lambda ctx: bot_main.power_off_host(ctx), None, False, 1),
+    # Every user finds the host off, they must all join one boot
+    "coldstart": (False, "stopped", ("start",), lambda ctx: bot_main.start_vm_command.callback(ctx), "running", True, 1),
+}
+
+
+def outcome_failures(name, fake_proxmox, fake_bmc, target_vm_state, target_power, power_commands):
+    # A command that returns without raising may still have done nothing (prompt timed out,
+    # "something went wrong"), so the fake backends are checked for the intended result
+    failures = 0
+    if target_vm_state is not None:
+        for vm_id, vm in sorted(fake_proxmox.vms.items()):
+            if vm["status"] != target_vm_state:
+                failures += 1
+                print(f"{name}: VM {vm_id} is {vm['status']}, expected {target_vm_state}")
+    if target_power is not None and fake_bmc.power_on != target_power:
+        failures += 1
+        print(f"{name}: host is powered {'on' if fake_bmc.power_on else 'off'}, expected {'on' if target_power else 'off'}")
+    sent = fake_bmc.calls.get('chassis_control', 0)
+    if power_commands is not None and sent != power_commands:
+        failures += 1
+        print(f"{name}: {sent} IPMI power commands sent, expected {power_commands}")
+    return failures
+
+
+async def run_scenario(name, args, fake_proxmox, fake_bmc):
+    powered, vm_state, answers, handler, target_vm_state, target_power, power_commands = SCENARIOS[name]
+    fake_bmc.set_power(powered)
+    fake_proxmox.set_all(vm_state)
+    fake_proxmox.reset_counters()
+    fake_bmc.reset_counters()
+    # The service's cached chassis status is from the previous scenario
+    bot_main.ipmi._status_at = 0.0
+    bot_main.status_cache.clear()
+    # The power state the previous scenario left behind doesn't carry over
+    bot_main.host_lifecycle.state = host_lifecycle.READY if powered else host_lifecycle.OFF
+
+    channel = FakeChannel(CHANNEL_ID)
+    latencies = []
+    failures = 0
+
+    async def user_session(user_index):
+        nonlocal failures
+        user = FakeUser(1000 + user_index, f"bench-user-{user_index}")
+        for _ in range(args.rounds):
+            ctx = FakeContext(user, channel, bot_main.interaction_dispatcher, answers, args.answer_delay)
+            started = time.monotonic()
+            try:
+                await handler(ctx)
+            except Exception as e:
+                failures += 1
+                print(f"{name}: command failed for {user}: {type(e).__name__}: {e}")
+            latencies.append(time.monotonic() - started)
+
+    started = time.monotonic()
+    await asyncio.gather(*(user_session(user_index) for user_index in range(args.users)))
+    wall = time.monotonic() - started
+    # Let the task poller and prompts settle so they don't leak into the next scenario
+    while bot_main.vm_operations.pending() or bot_main.interaction_dispatcher.open_prompts():
+        await asyncio.sleep(0.05)
+    failures += outcome_failures(name, fake_proxmox, fake_bmc, target_vm_state, target_power, power_commands)
+
+    commands_run = len(latencies)
+    return {
+        "scenario": name,
+        "commands": commands_run,
+        "failures": failures,
+        "p50": percentile(latencies, 0.50),
+        "p95": percentile(latencies, 0.95),
+        "p99": percentile(latencies, 0.99),
+        "max": max(latencies) if latencies else 0.0,
+        "throughput": commands_run / wall if wall else 0.0,
+        "proxmox_calls_per_command": fake_proxmox.total_requests() / max(commands_run, 1),
+        "ipmi_calls_per_command": fake_bmc.total_calls() / max(commands_run, 1),
+        "discord_sends_per_command": channel.sent / max(commands_run, 1),
+        "discord_edits_per_command": channel.edits / max(commands_run, 1),
+        "proxmox_calls": dict(sorted(fake_proxmox.requests.items())),
+    }
+
+
+def print_results(results, verbose):
+    print(f"{'scenario':<14}{'cmds':>6}{'fail':>6}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}"
+          f"{'cmd/s':>9}{'pve/cmd':>9}{'ipmi/cmd':>10}{'msg/cmd':>9}{'edit/cmd':>10}")
+    for result in results:
+        print(f"{result['scenario']:<14}{result['commands']:>6}{result['failures']:>6}"
+              f"{result['p50'] * 1000:>10.1f}{result['p95'] * 1000:>10.1f}{result['p99'] * 1000:>10.1f}"
+              f"{result['throughput']:>9.1f}{result['proxmox_calls_per_command']:>9.2f}"
+              f"{result['ipmi_calls_per_command']:>10.2f}{result['discord_sends_per_command']:>9.2f}"
+              f"{result.get('discord_edits_per_command', 0):>10.2f}")
+        if verbose:
+            for endpoint, count in result["proxmox_calls"].items():
+                print(f"    {count:>6}  {endpoint}")
+
+
+def compare(results, baseline_path, max_regression):
+    # Returns the regressions against a previous --json output
+    with open(baseline_path, 'r') as baseline_file:
+        baseline = {result["scenario"]: result for result in json.load(baseline_file)}
+    regressions = []
+    for result in results:
+        previous = baseline.get(result["scenario"])
+        if previous is None:
+            continue
+        if result["failures"] > previous.get("failures", 0):
+            regressions.append(f"{result['scenario']} failures: {previous.get('failures', 0)} -> {result['failures']}")
+        for key in ("p95", "p99", "proxmox_calls_per_command", "ipmi_calls_per_command", "discord_sends_per_command",
+                    "discord_edits_per_command"):
+            if key not in previous:
+                continue
+            if result[key] > previous[key] * (1 + max_regression) and result[key] - previous[key] > 1e-3:
+                regressions.append(f"{result['scenario']} {key}: {previous[key]:.4f} -> {result[key]:.4f}")
+    return regressions
+
+
+async def run(args):
+    fake_proxmox = FakeProxmox(nodes=(NODE,), latency=args.latency, jitter=args.jitter,
+                               failure_rate=args.failure_rate, task_duration=args.task_duration)
+    await fake_proxmox.start()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        config_path = os.path.join(workdir, "config.json")
+        config = bench_config(args, fake_proxmox, workdir)
+        with open(config_path, 'w') as config_file:
+            json.dump(config, config_file)
+        for vm_ids in config["discord"]["discord_to_vm_mapping"].values():
+            for vm_id in vm_ids if isinstance(vm_ids, list) else [vm_ids]:
+                fake_proxmox.add_vm(vm_id, NODE)
+
+        bot_main.create_bot(config_path)
+        # The real IpmiService runs, only its BMC connection is fake
+        fake_bmc = FakeBmc(fake_proxmox, latency=args.ipmi_latency, boot_time=args.boot_time)
+        fake_bmc.install(bot_main.ipmi)
+        if args.watcher:
+            bot_main.watcher.start()
+
+        results = []
+        try:
+            for name in args.scenarios:
+                results.append(await run_scenario(name, args, fake_proxmox, fake_bmc))
+        finally:
+            if args.watcher:
+                bot_main.watcher.stop()
+            bot_main.ipmi.close()
+            fake_bmc.close()
+            await bot_main.proxmox.close()
+            await fake_proxmox.stop()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the bot commands against fake Proxmox, IPMI and Discord.')
+    parser.add_argument('--users', type=int, default=20, help='Concurrent synthetic users')
+    parser.add_argument('--rounds', type=int, default=3, help='Commands each user runs per scenario')
+    parser.add_argument('--vms-per-user', type=int, default=1)
+    parser.add_argument('--scenarios', nargs='+', default=list(SCENARIOS), choices=list(SCENARIOS))
+    parser.add_argument('--latency', type=float, default=0.02, help='Proxmox API latency in seconds')
+    parser.add_argument('--jitter', type=float, default=0.01, help='Proxmox API latency jitter in seconds')
+    parser.add_argument('--failure-rate', type=float, default=0.0, help='Share of Proxmox requests answered with a 500')
+    parser.add_argument('--task-duration', type=float, default=0.5, help='Seconds a VM start/shutdown task runs')
+    parser.add_argument('--ipmi-latency', type=float, default=0.05, help='IPMI command latency in seconds')
+    parser.add_argument('--ipmi-status-ttl', type=float, default=5)
+    parser.add_argument('--boot-time', type=float, default=2.0, help='Seconds from IPMI power on to Proxmox answering')
+    parser.add_argument('--answer-delay', type=float, default=0.0, help='Seconds before a synthetic user clicks a button')
+    parser.add_argument('--watcher', action='store_true', help='Run the state watcher during the benchmark')
+    parser.add_argument('--verbose', action='store_true', help='Show Proxmox calls per endpoint')
+    parser.add_argument('--json', dest='json_path', help='Write the results to this file')
+    parser.add_argument('--compare', dest='baseline_path', help='Fail if results regress against this --json file')
+    parser.add_argument('--max-regression', type=float, default=0.2, help='Allowed relative regression for --compare')
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args))
+    print_results(results, args.verbose)
+
+    if args.json_path:
+        with open(args.json_path, 'w') as json_file:
+            json.dump(results, json_file, indent=2)
+
+    if args.baseline_path:
+        regressions = compare(results, args.baseline_path, args.max_regression)
+        for regression in regressions:
+            print(f"Regression: {regression}")
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,89 @@
+import time
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitBreaker:
+    # Stops calling a service that keeps failing to connect. After
+    # failure_threshold failures in a row the circuit opens and calls fail
+    # immediately. Once reset_timeout has passed a single probe call is let
+    # through (half-open), its outcome closes or re-opens the circuit.
+    #
+    # host_power is an optional callable returning the last known power state
+    # of the machine behind the service (True/False/None). A host known to be
+    # off opens the circuit right away; a host known to be on is probed every
+    # probe_interval seconds instead of waiting out reset_timeout, so a fresh
+    # boot is picked up quickly.
+    def __init__(self, name, failure_threshold=3, reset_timeout=30, probe_interval=2, host_power=None):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.probe_interval = probe_interval
+        self.host_power = host_power
+        self.state = CLOSED
+        self.failures = 0
+        self.rejected = 0
+        self.opened_at = 0.0
+        self.reason = None
+        self._probing = False
+
+    def _open(self, reason):
+        if self.state != OPEN:
+            print(f"{self.name} circuit opened: {reason}")
+        self.state = OPEN
+        self.reason = reason
+        self.opened_at = time.monotonic()
+        self._probing = False
+
+    def allow(self):
+        power = self.host_power() if self.host_power is not None else None
+        if power is False:
+            if self.state == CLOSED:
+                self._open("host is powered off")
+            self.reason = "host is powered off"
+            self.rejected += 1
+            return False
+        if self.state == CLOSED:
+            return True
+        if self._probing:
+            self.rejected += 1
+            return False
+
+        wait = min(self.reset_timeout, self.probe_interval) if power is True else self.reset_timeout
+        if time.monotonic() - self.opened_at < wait:
+            self.rejected += 1
+            return False
+        self.state = HALF_OPEN
+        self._probing = True
+        return True
+
+    def record_success(self):
+        if self.state != CLOSED:
+            print(f"{self.name} circuit closed, service is answering again")
+        self.state = CLOSED
+        self.failures = 0
+        self.reason = None
+        self._probing = False
+
+    def record_failure(self, reason="connection failed"):
+        if self.state == HALF_OPEN:
+            self._open(f"probe failed: {reason}")
+            return
+        self.failures += 1
+        if self.failures >= self.failure_threshold:
+            self._open(f"{self.failures} failures in a row, last: {reason}")
+        elif self.state == OPEN:
+            self.opened_at = time.monotonic()
+
+    def release(self):
+        # A call that was let through ended without telling whether the service works (e.g. cancelled)
+        if self.state == HALF_OPEN:
+            self.state = OPEN
+        self._probing = False
+
+    def describe(self):
+        if self.state == CLOSED:
+            return f"{self.name} circuit closed"
+        return f"{self.name} circuit {self.state.replace('_', '-')} ({self.reason})"
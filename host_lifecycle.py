@@ -0,0 +1,151 @@
+import asyncio
+import contextlib
+import time
+
+UNKNOWN = "unknown"
+OFF = "off"
+BOOTING = "booting"
+READY = "ready"
+DRAINING = "draining"
+SHUTTING_DOWN = "shutting_down"
+
+
+class HostUnavailable(Exception):
+    # A VM start or a power off was refused because of the host's state
+    pass
+
+
+class HostLifecycle:
+    # The host's power lifecycle, shared by every command:
+    #
+    #   OFF -> BOOTING -> READY -> DRAINING -> SHUTTING_DOWN -> OFF
+    #
+    # One boot serves everyone: callers that arrive while the host is booting
+    # wait on the same readiness future instead of sending their own power on.
+    # VM starts register themselves while they wait, and a power off is refused
+    # while any are pending. Every check-and-change below runs without an await,
+    # so it is atomic on the event loop.
+    def __init__(self, send_power_on, wait_until_ready, shutdown_timeout=600):
+        self.send_power_on = send_power_on  # async, sends the IPMI power on
+        self.wait_until_ready = wait_until_ready  # async, True once Proxmox answers
+        self.shutdown_timeout = shutdown_timeout
+        self.state = UNKNOWN
+        self.pending_starts = 0
+        self._shutdown_at = 0.0
+        self._ready = None  # future shared by everyone waiting for the current boot
+        self._boot_task = None
+
+    def _set(self, state):
+        if state != self.state:
+            print(f"Host state: {self.state} -> {state}")
+            self.state = state
+
+    def _expire_shutdown(self):
+        # A soft off the OS ignored must not block the host forever
+        if self.state == SHUTTING_DOWN and time.monotonic() - self._shutdown_at > self.shutdown_timeout:
+            print(f"Host still not off {self.shutdown_timeout} seconds after the power off")
+            self._set(UNKNOWN)
+
+    def observe(self, host_power=None, proxmox_ready=None):
+        # Keeps the state in line with what polls see, the bot's own transitions win
+        self._expire_shutdown()
+        if self.state == BOOTING:
+            return
+        if host_power is False:
+            self._set(OFF)
+        elif proxmox_ready is True and self.state in (UNKNOWN, OFF):
+            self._set(READY)
+        elif host_power is True and self.state == OFF:
+            self._set(UNKNOWN)  # Powered on outside the bot, READY once Proxmox answers
+        elif proxmox_ready is False and self.state == READY:
+            self._set(UNKNOWN)
+
+    async def boot(self):
+        # Sends the power on unless a boot is already under way, returns the shared readiness future
+        # A host believed READY is booted anyway, callers only get here when the node didn't answer
+        self._expire_shutdown()
+        if self.state == BOOTING:
+            return self._ready
+        if self.state in (DRAINING, SHUTTING_DOWN):
+            raise HostUnavailable(f"the host is {self.state.replace('_', ' ')}")
+
+        self._set(BOOTING)
+        self._ready = asyncio.get_running_loop().create_future()
+        try:
+            await self.send_power_on()
+        except Exception as e:
+            self._finish_boot(False)
+            raise e
+        self._boot_task = asyncio.ensure_future(self._follow_boot())
+        return self._ready
+
+    async def _follow_boot(self):
+        ready = False
+        try:
+            ready = await self.wait_until_ready()
+        except Exception as e:
+            print(f"Error while waiting for the host to boot: {str(e)}")
+        finally:
+            self._finish_boot(ready)
+
+    def _finish_boot(self, ready):
+        self._set(READY if ready else UNKNOWN)
+        future, self._ready = self._ready, None
+        if future is not None and not future.done():
+            future.set_result(ready)
+
+    async def wait_ready(self):
+        # True once the current boot finished and Proxmox answers, False if it failed
+        if self.state == READY:
+            return True
+        if self.state != BOOTING or self._ready is None:
+            return False
+        return await asyncio.shield(self._ready)
+
+    @contextlib.contextmanager
+    def pending_start(self):
+        # Wrap a VM start, from the moment it is asked for until Proxmox accepted it
+        self._expire_shutdown()
+        if self.state in (DRAINING, SHUTTING_DOWN):
+            raise HostUnavailable(f"the host is {self.state.replace('_', ' ')}")
+        self.pending_starts += 1
+        try:
+            yield
+        finally:
+            self.pending_starts -= 1
+
+    def _refuse_power_off(self):
+        if self.state == BOOTING:
+            raise HostUnavailable("the host is still booting")
+        if self.pending_starts:
+            raise HostUnavailable(f"{self.pending_starts} VM start(s) are pending")
+
+    def begin_drain(self):
+        self._refuse_power_off()
+        if self.state == SHUTTING_DOWN:
+            raise HostUnavailable("the host is already shutting down")
+        self._set(DRAINING)
+
+    def end_drain(self):
+        # Draining was given up, the host stays on
+        if self.state == DRAINING:
+            self._set(READY)
+
+    def begin_shutdown(self):
+        # True if the power off should be sent, False if the host is already off.
+        # Only the first of several concurrent power offs gets through.
+        self._expire_shutdown()
+        if self.state == SHUTTING_DOWN:
+            raise HostUnavailable("the host is already shutting down")
+        if self.state == OFF:
+            return False
+        if self.state != DRAINING:
+            self._refuse_power_off()
+        self._set(SHUTTING_DOWN)
+        self._shutdown_at = time.monotonic()
+        return True
+
+    def cancel_shutdown(self):
+        # The power off could not be sent
+        if self.state == SHUTTING_DOWN:
+            self._set(UNKNOWN)
@@ -0,0 +1,101 @@
+import math
+import time
+
+
+class Ewma:
+    # Exponentially weighted moving average over irregularly spaced samples.
+    # time_constant is in seconds, a sample that old still weighs about 37%.
+    def __init__(self, time_constant):
+        self.time_constant = time_constant
+        self.value = None
+        self.updated_at = None
+
+    def update(self, value, at):
+        if self.value is None or self.updated_at is None:
+            self.value = value
+        else:
+            elapsed = max(at - self.updated_at, 0)
+            alpha = 1 - math.exp(-elapsed / self.time_constant) if self.time_constant > 0 else 1
+            self.value += alpha * (value - self.value)
+        self.updated_at = at
+        return self.value
+
+
+class IdleDetector:
+    # Decides when the host has nothing to do: no mapped VM has been running for
+    # grace_period seconds and the node's smoothed CPU and network load are
+    # under their thresholds. Keeps one timestamp per VM and one average per
+    # metric, however long it runs.
+    def __init__(self, grace_period=1800, cpu_threshold=0.05, net_threshold=100000, time_constant=600):
+        self.grace_period = grace_period
+        self.cpu_threshold = cpu_threshold  # Fraction of all cores, 0.05 is 5%
+        self.net_threshold = net_threshold  # Bytes per second in + out
+        self.cpu = Ewma(time_constant)
+        self.net = Ewma(time_constant)
+        self.last_running = {}  # vm_id -> monotonic time it was last seen running
+        self.last_activity = time.monotonic()
+        self._last_sample_time = 0
+
+    @property
+    def time_constant(self):
+        return self.cpu.time_constant
+
+    @time_constant.setter
+    def time_constant(self, value):
+        self.cpu.time_constant = value
+        self.net.time_constant = value
+
+    def reset(self):
+        # Host went off: start over once it is back
+        self.cpu = Ewma(self.time_constant)
+        self.net = Ewma(self.time_constant)
+        self.last_running.clear()
+        self._last_sample_time = 0
+        self.note_activity()
+
+    def note_activity(self):
+        self.last_activity = time.monotonic()
+
+    def observe_vms(self, vm_statuses):
+        now = time.monotonic()
+        for vm_id, status in vm_statuses.items():
+            if status == 'running':
+                self.last_running[vm_id] = now
+                self.last_activity = now
+        # Unmapped VMs drop out, so the dict never outgrows the mapping
+        for vm_id in set(self.last_running) - set(vm_statuses):
+            del self.last_running[vm_id]
+
+    def observe_node_samples(self, samples):
+        # samples: /nodes/{node}/rrddata rows, only rows newer than the last call are used
+        for sample in sorted(samples, key=lambda row: row.get("time", 0)):
+            sample_time = sample.get("time", 0)
+            if sample_time <= self._last_sample_time:
+                continue
+            self._last_sample_time = sample_time
+            cpu = sample.get("cpu")
+            if isinstance(cpu, (int, float)) and not math.isnan(cpu):
+                self.cpu.update(cpu, sample_time)
+            netin, netout = sample.get("netin"), sample.get("netout")
+            if isinstance(netin, (int, float)) and isinstance(netout, (int, float)) \
+                    and not math.isnan(netin) and not math.isnan(netout):
+                self.net.update(netin + netout, sample_time)
+
+    def idle_for(self):
+        return time.monotonic() - self.last_activity
+
+    def node_is_quiet(self):
+        # Without any samples yet the node load isn't known, so it isn't quiet
+        if self.cpu.value is None:
+            return False
+        if self.cpu.value >= self.cpu_threshold:
+            return False
+        return self.net.value is None or self.net.value < self.net_threshold
+
+    def is_idle(self):
+        return self.idle_for() >= self.grace_period and self.node_is_quiet()
+
+    def describe(self):
+        cpu = f"{self.cpu.value * 100:.1f}%" if self.cpu.value is not None else "unknown"
+        net = f"{self.net.value / 1024:.0f} KiB/s" if self.net.value is not None else "unknown"
+        return f"idle for {self.idle_for() / 60:.0f} min, CPU {cpu}, network {net}"
@@ -0,0 +1,64 @@
+import asyncio
+import secrets
+import discord
+
+
+class InteractionDispatcher:
+    # Routes button clicks to the prompt waiting for them through one dict keyed
+    # by custom id, so resolving a click costs the same no matter how many
+    # prompts are open.
+    PREFIX = "prompt"
+
+    def __init__(self):
+        self._handlers = {}  # custom_id -> (future, user_id, choice)
+
+    def open_prompts(self):
+        return len({id(handler[0]) for handler in self._handlers.values()})
+
+    async def ask(self, send, content, choices, user, timeout):
+        # choices: list of (choice, label, emoji, style). Sends the prompt in a single
+        # message and returns (message, choice), choice is None on timeout.
+        # With user None anyone in the channel may answer.
+        nonce = secrets.token_hex(8)
+        future = asyncio.get_running_loop().create_future()
+        view = discord.ui.View(timeout=None)
+        custom_ids = []
+        for choice, label, emoji, style in choices:
+            custom_id = f"{self.PREFIX}:{nonce}:{choice}"
+            custom_ids.append(custom_id)
+            self._handlers[custom_id] = (future, user.id if user is not None else None, choice)
+            view.add_item(discord.ui.Button(custom_id=custom_id, label=label, emoji=emoji, style=style))
+        # Clicks are routed by this dispatcher, keep the view out of discord.py's view store
+        view.stop()
+
+        try:
+            message = await send(content, view=view)
+            try:
+                choice = await asyncio.wait_for(future, timeout)
+            except asyncio.TimeoutError:
+                choice = None
+        finally:
+            for custom_id in custom_ids:
+                self._handlers.pop(custom_id, None)
+        return message, choice
+
+    async def dispatch(self, interaction):
+        if interaction.type != discord.InteractionType.component:
+            return
+        custom_id = (interaction.data or {}).get("custom_id", "")
+        if not custom_id.startswith(f"{self.PREFIX}:"):
+            return
+
+        handler = self._handlers.get(custom_id)
+        if handler is None:
+            await interaction.response.send_message("This prompt has expired.", ephemeral=True)
+            return
+
+        future, user_id, choice = handler
+        if user_id is not None and interaction.user.id != user_id:
+            await interaction.response.send_message("This prompt isn't for you.", ephemeral=True)
+            return
+
+        await interaction.response.defer()
+        if not future.done():
+            future.set_result(choice)
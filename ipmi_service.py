@@ -0,0 +1,159 @@
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+import pyipmi
+import pyipmi.interfaces
+
+
+class IpmiService:
+    # Async front for pyipmi. The BMC session is opened on first use, every call
+    # runs on one dedicated worker thread so it never blocks the event loop.
+    TRANSPORTS = ("ipmitool", "rmcp")
+
+    def __init__(self, host, port, username, password, timeout=10, status_ttl=5, on_call=None, read_workers=4,
+                 transport="ipmitool", keep_alive_interval=1):
+        self.host = host
+        self.port = port
+        self.username = username
+        self.password = password
+        self.timeout = timeout
+        self.status_ttl = status_ttl
+        self.on_call = on_call  # optional (method, outcome, seconds) callback
+        self.transport = transport
+        self.keep_alive_interval = keep_alive_interval
+        if transport == "rmcp":
+            # One UDP session shared by every call, reads can't interleave on it
+            read_workers = 1
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="ipmi")
+        # Sensor reads don't change anything on the BMC, so several may run at once
+        self._read_executor = ThreadPoolExecutor(max_workers=read_workers, thread_name_prefix="ipmi-read")
+        self._connection = None
+        self._control_lock = asyncio.Lock()
+        self._status = None
+        self._status_at = 0.0
+        self._status_task = None
+
+    # Worker thread side
+
+    def _connect(self):
+        if self.transport == "rmcp":
+            # In-process IPMI over LAN: no ipmitool process per command, and pyipmi
+            # keeps the session alive between calls
+            interface = pyipmi.interfaces.create_interface('rmcp', slave_address=0x81, host_target_address=0x20,
+                                                           keep_alive_interval=self.keep_alive_interval)
+        else:
+            # Forks ipmitool (lanplus) for every command
+            interface = pyipmi.interfaces.create_interface('ipmitool', interface_type='lanplus')
+        connection = pyipmi.create_connection(interface)
+        connection.session.set_session_type_rmcp(self.host, self.port)
+        connection.session.set_auth_type_user(self.username, self.password)
+        if self.transport == "rmcp":
+            connection.target = pyipmi.Target(ipmb_address=0x20)
+        connection.session.establish()
+        print(f"IPMI session established with {self.host}:{self.port} over {self.transport}")
+        return connection
+
+    def _disconnect(self):
+        connection, self._connection = self._connection, None
+        if connection is not None:
+            try:
+                connection.session.close()
+            except Exception:
+                pass
+
+    def _ensure_connected(self):
+        if self._connection is None:
+            self._connection = self._connect()
+        return self._connection
+
+    def _call_sync(self, method, args, retry):
+        self._ensure_connected()
+        try:
+            return getattr(self._connection, method)(*args)
+        except Exception as e:
+            # Most failures here are an expired or dropped session, start a fresh one
+            print(f"IPMI {method} failed, re-establishing session: {str(e)}")
+            self._disconnect()
+            if not retry:
+                raise
+            self._connection = self._connect()
+            return getattr(self._connection, method)(*args)
+
+    # Event loop side
+
+    async def call(self, method, *args, timeout=None, retry=True):
+        loop = asyncio.get_running_loop()
+        future = loop.run_in_executor(self._executor, self._call_sync, method, args, retry)
+        started = time.monotonic()
+        outcome = "error"
+        try:
+            result = await asyncio.wait_for(future, timeout or self.timeout)
+            outcome = "ok"
+            return result
+        except asyncio.TimeoutError:
+            outcome = "timeout"
+            raise
+        finally:
+            if self.on_call is not None:
+                self.on_call(method, outcome, time.monotonic() - started)
+
+    async def read(self, method, *args, timeout=None):
+        # Read-only call on the shared session, runs next to other reads and is not retried
+        loop = asyncio.get_running_loop()
+        connection = self._connection
+        if connection is None:
+            connection = await asyncio.wait_for(loop.run_in_executor(self._executor, self._ensure_connected),
+                                                timeout or self.timeout)
+        future = loop.run_in_executor(self._read_executor, lambda: getattr(connection, method)(*args))
+        started = time.monotonic()
+        outcome = "error"
+        try:
+            result = await asyncio.wait_for(future, timeout or self.timeout)
+            outcome = "ok"
+            return result
+        except asyncio.TimeoutError:
+            outcome = "timeout"
+            raise
+        finally:
+            if self.on_call is not None:
+                self.on_call(method, outcome, time.monotonic() - started)
+
+    async def chassis_control(self, command):
+        # Power commands are never retried automatically and never overlap
+        async with self._control_lock:
+            try:
+                return await self.call('chassis_control', command, retry=False)
+            finally:
+                self._status_at = 0.0
+
+    async def chassis_status(self, max_age=None):
+        max_age = self.status_ttl if max_age is None else max_age
+        if self._status is not None and time.monotonic() - self._status_at <= max_age:
+            return self._status
+
+        # Concurrent readers share one outstanding request
+        if self._status_task is None or self._status_task.done():
+            self._status_task = asyncio.ensure_future(self._read_chassis_status())
+        return await asyncio.shield(self._status_task)
+
+    async def _read_chassis_status(self):
+        status = await self.call('get_chassis_status')
+        self._status = status
+        self._status_at = time.monotonic()
+        return status
+
+    async def power_state(self, max_age=None):
+        status = await self.chassis_status(max_age)
+        return bool(status.power_on)
+
+    def cached_power_state(self, max_age=None):
+        # Last known power state without touching the BMC, None if unknown or stale
+        max_age = self.status_ttl if max_age is None else max_age
+        if self._status is None or time.monotonic() - self._status_at > max_age:
+            return None
+        return bool(self._status.power_on)
+
+    def close(self):
+        self._executor.submit(self._disconnect)
+        self._executor.shutdown(wait=False)
+        self._read_executor.shutdown(wait=False)
@@ -1,104 +1,548 @@
 import discord
 from discord.ext import commands, tasks
-import requests
 import asyncio
 import json
-import pyipmi
-import pyipmi.interfaces
 import argparse
+import contextlib
+import datetime
+import os
+import signal
+import time
+import types
+from proxmox_client import ProxmoxClient, ProxmoxConnectionError, CircuitOpenError
+from circuit_breaker import CircuitBreaker
+from status_cache import StatusCache
+from state_watcher import StateWatcher
+from ipmi_service import IpmiService
+from readiness import BootHistory, wait_for_node_ready
+from message_scheduler import MessageScheduler
+from vm_index import VmNodeIndex
+from vm_operations import TaskTracker, VmOperationQueue
+from interaction_dispatcher import InteractionDispatcher
+from resource_monitor import EventRateCounter, current_rss_mb
+from idle_detector import IdleDetector
+from usage_history import UsageHistory, PrewarmPlanner
+from sensors import SensorReader, group_readings
+from progress_message import ProgressMessage
+from metrics import MetricsRegistry, LoopLagMonitor, start_metrics_server
+from host_lifecycle import HostLifecycle, HostUnavailable, BOOTING, SHUTTING_DOWN
+
+# Reference point for the time-to-ready log line
+MODULE_LOADED_AT = time.monotonic()
 
+# Constants for IPMI power control
+IPMI_POWER_ON = 1  # IPMI Chassis Control Command: Power On
+IPMI_POWER_OFF_SOFT = 5  # IPMI Chassis Control Command: Power Off (Soft)
 
-# Create an instance of discord.Intents
-intents = discord.Intents.all()  # This allows all privileged intents
-
-# Initialize the bot with the intents parameter
-bot = commands.Bot(command_prefix='!', intents=intents)
-
-
-# Create an ArgumentParser instance
-parser = argparse.ArgumentParser(description='Discord bot for Proxmox VM power operations.')
-
-# Add the --config-file argument
-parser.add_argument('--config-file', dest='config_file', default='config.json',
-                    help='Path to the configuration file')
+# Settings that only take effect on a restart, a reload that changes them is logged
+RESTART_ONLY_SETTINGS = ("DISCORD_TOKEN", "DISCORD_CHANNEL_ID", "DISCORD_MAX_MESSAGES", "DISCORD_SLASH_COMMANDS",
+                         "METRICS_ENABLED", "METRICS_HOST", "METRICS_PORT", "METRICS_LAG_INTERVAL")
 
-# Parse the command-line arguments
-args = parser.parse_args()
 
-# Load configuration from config file
-config_file_path = args.config_file
-with open(config_file_path, 'r') as config_file:
-    config = json.load(config_file)
+def load_config(config_file_path):
+    # Reads and validates the config file and returns every setting as attributes of one namespace.
+    # Raises OSError/ValueError and leaves the running settings alone if the file is bad.
+    with open(config_file_path, 'r') as config_file:
+        config = json.load(config_file)
     discord_config = config.get("discord", {})
     ipmi_config = config.get("ipmi", {})
     proxmox_config = config.get("proxmox", {})
+    watcher_config = config.get("watcher", {})
+    metrics_config = config.get("metrics", {})
+    idle_config = config.get("idle", {})
+    prewarm_config = config.get("prewarm", {})
 
+    try:
+        channel_id = int(discord_config.get("channel_id", ""))
+    except (TypeError, ValueError):
+        raise ValueError(f"discord.channel_id must be a channel ID, got {discord_config.get('channel_id')!r}")
 
-# Discord Configurations
-DISCORD_TOKEN = discord_config.get("token", "")
-DISCORD_POWER_OPTIONS = discord_config.get("offer_power_options", True)
-DISCORD_DELETE_MESSAGES = discord_config.get("delete_messages", True)
-DISCORD_CLEAR_CHANNEL = discord_config.get("clear_channel", False)
-DISCORD_CHANNEL_ID = int(discord_config.get("channel_id", ""))
-discord_to_vm_mapping = discord_config.get("discord_to_vm_mapping", {})
-
-# Proxmox Configurations
-PROXMOX_BASE_URL = proxmox_config.get("base_url", "")
-PROXMOX_TOKEN = proxmox_config.get("token", "")
-PROXMOX_USERNAME = proxmox_config.get("username", "")
-PROXMOX_REALM = proxmox_config.get("realm", "")
-PROXMOX_TOKEN_NAME = proxmox_config.get("token_name", "")
-PROXMOX_NODE_NAME = proxmox_config.get("node_name", "")
-PROXMOX_STARTUP_TIME = proxmox_config.get("startup_time", 180)  # Default startup time is 3 minutes
-
-# IPMI Configurations
-IPMI_HOST = ipmi_config.get("host", "")
-IPMI_USERNAME = ipmi_config.get("username", "")
-IPMI_PASSWORD = ipmi_config.get("password", "")
-IPMI_PORT = ipmi_config.get("port", 623)
+    discord_to_vm_mapping = discord_config.get("discord_to_vm_mapping", {})  # Values are a VM ID or a list of VM IDs
+    if not isinstance(discord_to_vm_mapping, dict):
+        raise ValueError("discord.discord_to_vm_mapping must be an object of Discord user ID -> VM ID(s)")
 
-# Constants for IPMI power control
-IPMI_POWER_ON = 1  # IPMI Chassis Control Command: Power On
-IPMI_POWER_OFF_SOFT = 5  # IPMI Chassis Control Command: Power Off (Soft)
+    try:
+        admin_role_ids = {int(role_id) for role_id in discord_config.get("admin_role_ids", [])}
+        admin_user_ids = {int(user_id) for user_id in discord_config.get("admin_user_ids", [])}
+    except (TypeError, ValueError):
+        raise ValueError("discord.admin_role_ids and discord.admin_user_ids must be lists of IDs")
+
+    # Precomputed both ways so commands never scan the mapping
+    user_vm_index = {}
+    vm_owner_index = {}
+    for discord_user_id, vm_ids in discord_to_vm_mapping.items():
+        if not isinstance(vm_ids, list):
+            vm_ids = [vm_ids]
+        for vm_id in vm_ids:
+            if not isinstance(vm_id, (str, int)) or isinstance(vm_id, bool) or str(vm_id) == "":
+                raise ValueError(f"Invalid VM ID {vm_id!r} for Discord user {discord_user_id}")
+        user_vm_index[str(discord_user_id)] = [str(vm_id) for vm_id in vm_ids]
+        for vm_id in vm_ids:
+            vm_owner_index.setdefault(str(vm_id), []).append(str(discord_user_id))
+
+    values = {
+        # Discord Configurations
+        "DISCORD_TOKEN": discord_config.get("token", ""),
+        "DISCORD_POWER_OPTIONS": discord_config.get("offer_power_options", True),
+        "DISCORD_DELETE_MESSAGES": discord_config.get("delete_messages", True),
+        "DISCORD_CLEAR_CHANNEL": discord_config.get("clear_channel", False),
+        "DISCORD_CHANNEL_ID": channel_id,
+        "DISCORD_SLASH_COMMANDS": discord_config.get("slash_commands", True),
+        "DISCORD_MAX_MESSAGES": discord_config.get("max_messages", 100),  # Size of discord.py's message cache
+        "DISCORD_MEMORY_BUDGET_MB": discord_config.get("memory_budget_mb", 128),  # RSS above this is reported as a warning
+        "DISCORD_REPORT_INTERVAL": discord_config.get("report_interval", 60),  # Minutes between resource reports, 0 to disable
+        "DISCORD_CONFIG_RELOAD_INTERVAL": discord_config.get("config_reload_interval", 10),  # Seconds between config file checks, 0 to disable
+        "DISCORD_ADMIN_ROLE_IDS": admin_role_ids,  # Roles allowed to run the bulk commands
+        "DISCORD_ADMIN_USER_IDS": admin_user_ids,  # Users allowed to run the bulk commands, whatever their roles
+        "DISCORD_TO_VM_MAPPING": discord_to_vm_mapping,
+        "USER_VM_INDEX": user_vm_index,
+        "VM_OWNER_INDEX": vm_owner_index,
+        "MAPPED_VM_IDS": [vm_id for vm_ids in user_vm_index.values() for vm_id in vm_ids],
+
+        # Proxmox Configurations
+        "PROXMOX_BASE_URL": proxmox_config.get("base_url", ""),
+        "PROXMOX_TOKEN": proxmox_config.get("token", ""),
+        "PROXMOX_USERNAME": proxmox_config.get("username", ""),
+        "PROXMOX_REALM": proxmox_config.get("realm", ""),
+        "PROXMOX_TOKEN_NAME": proxmox_config.get("token_name", ""),
+        "PROXMOX_NODE_NAME": proxmox_config.get("node_name", ""),  # Node powered by IPMI, VMs may live on any cluster node
+        "PROXMOX_STARTUP_TIME": proxmox_config.get("startup_time", 180),  # Longest we wait for the host to boot, default is 3 minutes
+        "PROXMOX_READY_POLL_INITIAL": proxmox_config.get("ready_poll_initial", 2),  # First delay between readiness checks after power on
+        "PROXMOX_READY_POLL_MAX": proxmox_config.get("ready_poll_max", 15),  # Readiness checks back off up to this delay
+        "PROXMOX_BOOT_HISTORY_FILE": proxmox_config.get(
+            "boot_history_file", os.path.join(os.path.dirname(os.path.abspath(config_file_path)), "boot_history.json")),
+        "PROXMOX_VERIFY_SSL": proxmox_config.get("verify_ssl", False),
+        "PROXMOX_TIMEOUT": proxmox_config.get("timeout", 5),  # Per-request timeout in seconds
+        "PROXMOX_NODE_STATUS_TTL": proxmox_config.get("node_status_ttl", 5),  # Seconds a node status answer is reused
+        "PROXMOX_VM_STATUS_TTL": proxmox_config.get("vm_status_ttl", 3),  # Seconds a VM status answer is reused
+        "PROXMOX_VM_INDEX_TTL": proxmox_config.get("vm_index_ttl", 300),  # Seconds before the vmid -> node index is re-read
+        "PROXMOX_TASK_TIMEOUT": proxmox_config.get("task_timeout", 600),  # Longest we follow a start/shutdown task
+        "PROXMOX_TASK_POLL_MIN": proxmox_config.get("task_poll_min", 1),  # First delay between task status checks
+        "PROXMOX_TASK_POLL_MAX": proxmox_config.get("task_poll_max", 10),  # Task status checks back off up to this delay
+        "PROXMOX_MAX_CONCURRENCY": proxmox_config.get("max_concurrency", 8),  # Parallel requests when a bulk listing isn't available
+        "PROXMOX_BULK_PARALLELISM": proxmox_config.get("bulk_parallelism", 8),  # VM actions run at once by !startall, !stopall and !drain
+        "PROXMOX_BREAKER_THRESHOLD": proxmox_config.get("breaker_threshold", 3),  # Connection failures in a row before requests fail fast
+        "PROXMOX_BREAKER_RESET": proxmox_config.get("breaker_reset", 30),  # Seconds before a failing API is tried again
+        "PROXMOX_BREAKER_PROBE_INTERVAL": proxmox_config.get("breaker_probe_interval", 2),  # Retry delay instead while IPMI says the host is on
+
+        # IPMI Configurations
+        "IPMI_HOST": ipmi_config.get("host", ""),
+        "IPMI_USERNAME": ipmi_config.get("username", ""),
+        "IPMI_PASSWORD": ipmi_config.get("password", ""),
+        "IPMI_PORT": ipmi_config.get("port", 623),
+        "IPMI_TIMEOUT": ipmi_config.get("timeout", 10),  # Seconds before an IPMI call is given up
+        "IPMI_STATUS_TTL": ipmi_config.get("status_ttl", 5),  # Seconds a chassis status read is reused
+        "IPMI_TRANSPORT": ipmi_config.get("transport", "ipmitool"),  # ipmitool (lanplus, forks per command) or rmcp (in-process)
+        "IPMI_KEEP_ALIVE_INTERVAL": ipmi_config.get("keep_alive_interval", 1),  # Seconds between keep-alives on the rmcp session
+        "IPMI_SDR_CACHE_FILE": ipmi_config.get(
+            "sdr_cache_file", os.path.join(os.path.dirname(os.path.abspath(config_file_path)), "sdr_cache.json")),
+        "IPMI_SENSOR_CONCURRENCY": ipmi_config.get("sensor_concurrency", 4),  # Sensor readings requested at once
+        "IPMI_TELEMETRY_INTERVAL": ipmi_config.get("telemetry_interval", 0),  # Seconds between logged sensor readings, 0 to disable
+
+        # State watcher Configurations
+        "WATCHER_ENABLED": watcher_config.get("enabled", True),
+        "WATCHER_FAST_INTERVAL": watcher_config.get("fast_interval", 5),  # Seconds between polls while something is changing
+        "WATCHER_SLOW_INTERVAL": watcher_config.get("slow_interval", 30),  # Seconds between polls when idle
+        "WATCHER_MAX_AGE": watcher_config.get("max_snapshot_age", 45),  # Older snapshots are ignored by commands
+        "WATCHER_NOTIFY_CHANGES": watcher_config.get("notify_external_changes", True),
+
+        # Idle shutdown Configurations
+        "IDLE_ENABLED": idle_config.get("enabled", False),
+        "IDLE_GRACE_PERIOD": idle_config.get("grace_period", 1800),  # Seconds without a running mapped VM before the host counts as idle
+        "IDLE_CHECK_INTERVAL": idle_config.get("check_interval", 60),  # Seconds between idle checks
+        "IDLE_WARNING_TIME": idle_config.get("warning_time", 300),  # Seconds the channel gets to cancel a power off
+        "IDLE_CPU_THRESHOLD": idle_config.get("cpu_threshold", 0.05),  # Node CPU usage (0-1) under which the node is quiet
+        "IDLE_NET_THRESHOLD": idle_config.get("net_threshold", 100000),  # Node network bytes/sec under which the node is quiet
+        "IDLE_SMOOTHING": idle_config.get("smoothing", 600),  # Seconds over which node load is averaged
+
+        # Pre-warm Configurations
+        "PREWARM_ENABLED": prewarm_config.get("enabled", False),
+        "PREWARM_HISTORY_FILE": prewarm_config.get(
+            "history_file", os.path.join(os.path.dirname(os.path.abspath(config_file_path)), "usage_history.sqlite")),
+        "PREWARM_MIN_PROBABILITY": prewarm_config.get("min_probability", 0.5),  # Share of past weeks with demand in that hour
+        "PREWARM_HISTORY_WEEKS": prewarm_config.get("history_weeks", 8),  # Weeks of history the histogram is built from
+        "PREWARM_MIN_WEEKS": prewarm_config.get("min_weeks", 2),  # Weeks of history needed before pre-warming at all
+        "PREWARM_LEAD_MARGIN": prewarm_config.get("lead_margin", 120),  # Seconds added to the median boot time
+        "PREWARM_MAX_PER_DAY": prewarm_config.get("max_per_day", 2),  # Energy limit: pre-warm boots per day
+        "PREWARM_MAX_UNUSED": prewarm_config.get("max_unused_minutes", 45),  # Energy limit: a pre-warmed host nobody uses is powered off after this
+        "PREWARM_CHECK_INTERVAL": prewarm_config.get("check_interval", 120),  # Seconds between pre-warm checks
+
+        # Metrics Configurations
+        "METRICS_ENABLED": metrics_config.get("enabled", False),
+        "METRICS_HOST": metrics_config.get("host", "127.0.0.1"),  # Use 0.0.0.0 to scrape from outside a container
+        "METRICS_PORT": metrics_config.get("port", 9108),
+        "METRICS_LAG_INTERVAL": metrics_config.get("lag_interval", 0.5),  # Seconds between event loop lag samples
+    }
+
+    if values["IPMI_TRANSPORT"] not in IpmiService.TRANSPORTS:
+        raise ValueError(f"ipmi.transport must be one of {', '.join(IpmiService.TRANSPORTS)}, got {values['IPMI_TRANSPORT']!r}")
+    for name in ("PROXMOX_STARTUP_TIME", "PROXMOX_TIMEOUT", "IPMI_TIMEOUT", "WATCHER_FAST_INTERVAL", "WATCHER_SLOW_INTERVAL",
+                 "METRICS_LAG_INTERVAL", "IDLE_CHECK_INTERVAL",
+                 "PROXMOX_BULK_PARALLELISM", "PREWARM_CHECK_INTERVAL"):
+        if not isinstance(values[name], (int, float)) or values[name] <= 0:
+            raise ValueError(f"{name} must be a positive number, got {values[name]!r}")
+    return types.SimpleNamespace(**values)
+
+# The running config, read as settings.NAME. Replaced as a whole, never changed in place.
+settings = None
+
+def apply_config(new_settings):
+    # Swaps in every setting in one synchronous step, no command can observe a half-applied config
+    global settings
+    settings = new_settings
+
+# Exported on /metrics when metrics are enabled, always collected since it is cheap
+metrics = MetricsRegistry(prefix="proxmox_bot_")
+proxmox_request_seconds = metrics.histogram(
+    "proxmox_request_seconds", "Proxmox API request latency.", ("method", "endpoint", "status"))
+ipmi_call_seconds = metrics.histogram(
+    "ipmi_call_seconds", "IPMI command latency.", ("command", "outcome"))
+discord_request_seconds = metrics.histogram(
+    "discord_request_seconds", "Discord REST request latency.", ("method", "route", "status"))
+command_seconds = metrics.histogram(
+    "command_seconds", "Time from command invocation to completion.", ("command",))
+commands_total = metrics.counter(
+    "commands_total", "Commands handled, by outcome.", ("command", "outcome"))
+event_loop_lag_seconds = metrics.gauge(
+    "event_loop_lag_seconds", "How late the last event loop lag sample woke up.")
+event_loop_lag_histogram = metrics.histogram(
+    "event_loop_lag_sample_seconds", "Distribution of event loop lag samples.",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 5))
+metrics.gauge("pending_prompts", "Button prompts waiting for an answer.",
+              read=lambda: interaction_dispatcher.open_prompts())
+metrics.gauge("scheduled_deletions", "Messages waiting to be deleted.",
+              read=lambda: message_scheduler.pending())
+metrics.gauge("pending_vm_operations", "VM power actions queued or running.",
+              read=lambda: len(vm_operations.pending()) if vm_operations is not None else 0)
+metrics.gauge("tracked_proxmox_tasks", "Proxmox tasks being followed.",
+              read=lambda: task_tracker.tracked() if task_tracker is not None else 0)
+metrics.gauge("proxmox_circuit_state", "Proxmox circuit breaker: 0 closed, 1 half-open, 2 open.",
+              read=lambda: {"closed": 0, "half_open": 1, "open": 2}[proxmox.breaker.state] if proxmox is not None else 0)
+metrics.gauge("proxmox_circuit_rejected", "Proxmox requests failed fast by the circuit breaker.",
+              read=lambda: proxmox.breaker.rejected if proxmox is not None else 0)
+ipmi_sensor_value = metrics.gauge("ipmi_sensor_value", "Last telemetry reading of each BMC sensor.",
+                                  ("sensor", "group", "unit"))
+metrics.gauge("host_pending_vm_starts", "VM starts waiting for the host, a power off is refused while any are pending.",
+              read=lambda: host_lifecycle.pending_starts if host_lifecycle is not None else 0)
+metrics.gauge("resident_memory_megabytes", "Resident set size of the bot.", read=current_rss_mb)
+loop_lag_monitor = LoopLagMonitor(event_loop_lag_seconds, event_loop_lag_histogram)
+metrics_runner = None
+
+def observe_proxmox_request(method, endpoint, status, seconds):
+    proxmox_request_seconds.observe(seconds, method=method, endpoint=endpoint, status=status)
+
+def observe_ipmi_call(method, outcome, seconds):
+    ipmi_call_seconds.observe(seconds, command=method, outcome=outcome)
+
+def instrument_discord_http(http):
+    # Times every REST call discord.py makes, labelled by its route template
+    request = http.request
+
+    async def timed_request(route, **kwargs):
+        started = time.monotonic()
+        status = "error"
+        try:
+            result = await request(route, **kwargs)
+            status = "ok"
+            return result
+        except discord.HTTPException as e:
+            status = str(e.status)
+            raise
+        finally:
+            discord_request_seconds.observe(time.monotonic() - started,
+                                            method=route.method, route=route.path, status=status)
+
+    http.request = timed_request
+
+async def mark_command_start(ctx):
+    ctx.started_at = time.monotonic()
+    if ctx.command is not None and ctx.command.name in DEMAND_COMMANDS:
+        record_demand(ctx)
+
+def record_command(ctx, outcome):
+    name = ctx.command.qualified_name if ctx.command else "unknown"
+    commands_total.inc(command=name, outcome=outcome)
+    started_at = getattr(ctx, "started_at", None)
+    if started_at is not None:
+        command_seconds.observe(time.monotonic() - started_at, command=name)
+
+async def count_command_completion(ctx):
+    record_command(ctx, "ok")
+
+# Filled in by create_bot()
+bot = None
+config_file_path = None
+config_mtime = None
+ipmi = None
+proxmox = None
+vm_index = None
+watcher = None
+boot_history = None
+task_tracker = None
+vm_operations = None
+idle_detector = None
+sensor_reader = None
+usage_history = None
+host_lifecycle = None
+
+def build_ipmi():
+    # The BMC session is only opened on the first IPMI call
+    return IpmiService(settings.IPMI_HOST, settings.IPMI_PORT, settings.IPMI_USERNAME, settings.IPMI_PASSWORD,
+                       timeout=settings.IPMI_TIMEOUT, status_ttl=settings.IPMI_STATUS_TTL, on_call=observe_ipmi_call,
+                       read_workers=settings.IPMI_SENSOR_CONCURRENCY, transport=settings.IPMI_TRANSPORT,
+                       keep_alive_interval=settings.IPMI_KEEP_ALIVE_INTERVAL)
+
+def build_proxmox():
+    # Shared async Proxmox API client, keeps a pool of keep-alive connections.
+    # Fails fast while the host is known to be off or keeps refusing connections.
+    breaker = CircuitBreaker("Proxmox", failure_threshold=settings.PROXMOX_BREAKER_THRESHOLD,
+                             reset_timeout=settings.PROXMOX_BREAKER_RESET,
+                             probe_interval=settings.PROXMOX_BREAKER_PROBE_INTERVAL,
+                             host_power=lambda: ipmi.cached_power_state())
+    return ProxmoxClient(settings.PROXMOX_BASE_URL, settings.PROXMOX_USERNAME, settings.PROXMOX_REALM,
+                         settings.PROXMOX_TOKEN_NAME, settings.PROXMOX_TOKEN,
+                         verify_ssl=settings.PROXMOX_VERIFY_SSL, timeout=settings.PROXMOX_TIMEOUT,
+                         on_request=observe_proxmox_request, breaker=breaker)
+
+# Deletes temporary messages in batches from a single background task
+message_scheduler = MessageScheduler()
+
+def schedule_delete(message, delay):
+    if settings.DISCORD_DELETE_MESSAGES:
+        message_scheduler.schedule(message, delay)
+
+def delete_command_message(ctx):
+    # Slash command invocations have no message of their own to delete
+    if ctx.interaction is None:
+        schedule_delete(ctx.message, 0)
+
+# Button prompts are resolved through a custom id -> prompt table
+interaction_dispatcher = InteractionDispatcher()
+
+async def notify(ctx, text, delete_after=30, failed=False):
+    # Inside a command with a live progress message the text becomes a line of
+    # it, otherwise it is sent as its own temporary message
+    progress = getattr(ctx, "progress", None)
+    if progress is not None and not progress.finished:
+        text = text.removeprefix(f"{ctx.author.mention}, ")
+        await progress.update(text[:1].upper() + text[1:], failed=failed, delete_after=delete_after)
+        return
+    message = await ctx.send(text)
+    schedule_delete(message, delete_after)
+
+async def prompt_user(ctx, content, choices, timeout):
+    # Asks ctx.author, returns the chosen choice or None on timeout
+    progress = getattr(ctx, "progress", None)
+    if progress is None or progress.finished:
+        message, choice = await interaction_dispatcher.ask(ctx.send, content, choices, ctx.author, timeout=timeout)
+        schedule_delete(message, 0)
+        return choice
+
+    key = object()
+    content = content.removeprefix(f"{ctx.author.mention}, ")
+    try:
+        _, choice = await interaction_dispatcher.ask(
+            lambda text, view: progress.add_prompt(key, f"**{text[:1].upper() + text[1:]}**", view),
+            content, choices, ctx.author, timeout=timeout)
+    finally:
+        await progress.remove_prompt(key)
+    return choice
+
+@contextlib.asynccontextmanager
+async def live_progress(ctx, title):
+    # Gives the command one embed that every notify() and prompt updates in place
+    ctx.progress = ProgressMessage(ctx.send, title, ctx.author.mention)
+    try:
+        yield ctx.progress
+    finally:
+        try:
+            message = await ctx.progress.finish()
+            if message is not None:
+                schedule_delete(message, ctx.progress.delete_after)
+        except discord.HTTPException as e:
+            print(f"Failed to finish progress message: {e}")
+
+# Node and VM status answers are shared between commands for a few seconds
+status_cache = StatusCache()
+
+def is_ok(response):
+    return response.status_code == 200
+
+def user_vm_ids(discord_user_id):
+    return settings.USER_VM_INDEX.get(str(discord_user_id), [])
+
+def all_mapped_vm_ids():
+    return settings.MAPPED_VM_IDS
+
+def vm_owners(vm_id):
+    return settings.VM_OWNER_INDEX.get(str(vm_id), [])
+
+async def fetch_node_status(node=None):
+    node = node or settings.PROXMOX_NODE_NAME
+    return await status_cache.get(("node", node), settings.PROXMOX_NODE_STATUS_TTL,
+                                  lambda: proxmox.get_node_status(node), should_cache=is_ok)
+
+async def fetch_cluster_vms():
+    # Every VM in the cluster with its node and state, also keeps the vmid -> node index current
+    response = await status_cache.get(("vms",), settings.PROXMOX_VM_STATUS_TTL,
+                                      lambda: proxmox.get_cluster_resources("vm"), should_cache=is_ok)
+    if response.status_code == 200 and isinstance(response.data, list):
+        vm_index.update(response.data)
+        return response.data
+    print(f"Failed to list cluster resources. Error: {response.status_code}, Response: {response.text}")
+    return None
+
+async def vm_request(vm_id, call):
+    # Runs call(node) against the VM's current node. If Proxmox says the VM isn't
+    # there (404, or 500 "does not exist" after a migration) the index is re-read
+    # and the call retried once on the new node.
+    node = await vm_index.node_for(vm_id) or settings.PROXMOX_NODE_NAME
+    response = await call(node)
+    if response.status_code in (404, 500):
+        vm_index.invalidate(vm_id)
+        new_node = await vm_index.node_for(vm_id, refresh=True)
+        if new_node and new_node != node:
+            response = await call(new_node)
+    return response
+
+async def fetch_vm_status(vm_id):
+    return await status_cache.get(("vm", str(vm_id)), settings.PROXMOX_VM_STATUS_TTL,
+                                  lambda: vm_request(vm_id, lambda node: proxmox.get_vm_status(node, vm_id)),
+                                  should_cache=is_ok)
+
+def invalidate_vm_status(vm_id):
+    status_cache.invalidate(("vm", str(vm_id)), ("vms",))
+
+def invalidate_host_status():
+    status_cache.clear()
+
+async def read_host_power():
+    try:
+        host_power = await ipmi.power_state()
+    except Exception as e:
+        print(f"Failed to read chassis status: {str(e)}")
+        return None
+    host_lifecycle.observe(host_power=host_power)
+    return host_power
 
-interface = pyipmi.interfaces.create_interface('ipmitool', interface_type='lanplus')
-ipmi = pyipmi.create_connection(interface)
-ipmi.session.set_session_type_rmcp(IPMI_HOST, IPMI_PORT)
-ipmi.session.set_auth_type_user(IPMI_USERNAME, IPMI_PASSWORD)
-ipmi.session.establish()
+async def read_node_status():
+    try:
+        response = await fetch_node_status()
+    except ProxmoxConnectionError:
+        response = None
+    ready = response is not None and response.status_code == 200
+    host_lifecycle.observe(proxmox_ready=ready)
+    return response if ready else None
+
+async def read_mapped_vm_statuses():
+    return await get_vm_statuses(all_mapped_vm_ids())
+
+async def notify_state_change(key, old, new, expected):
+    # Only changes made outside the bot are announced, the bot already reports its own actions
+    if expected or not settings.WATCHER_NOTIFY_CHANGES:
+        return
+    if key == "host":
+        text = f"Host was powered {'on' if new else 'off'} outside of the bot."
+    elif key == "proxmox":
+        text = "Proxmox server is now online." if new else "Proxmox server stopped responding."
+    else:
+        vm_id = key[1]
+        owners = ", ".join(f"<@{user_id}>" for user_id in vm_owners(vm_id))
+        text = f"VM {vm_id}{f' ({owners})' if owners else ''} changed from {old} to {new}."
+    print(f"State change: {text}")
+
+    channel = bot.get_channel(settings.DISCORD_CHANNEL_ID)
+    if channel is None:
+        return
+    statechangemsg = await channel.send(text, allowed_mentions=discord.AllowedMentions.none())
+    schedule_delete(statechangemsg, 60)
+
+async def send_host_power_on():
+    watcher.expect("host", True)
+    watcher.expect("proxmox", True)
+    await ipmi.chassis_control(IPMI_POWER_ON)
+    invalidate_host_status()
+    idle_detector.note_activity()
+
+async def poll_until_host_ready():
+    # Polls IPMI and then Proxmox with backoff, returns as soon as the node answers
+    watcher.hurry()
+    boot_time = await wait_for_node_ready(read_host_power, read_node_status, settings.PROXMOX_STARTUP_TIME,
+                                          initial_delay=settings.PROXMOX_READY_POLL_INITIAL, max_delay=settings.PROXMOX_READY_POLL_MAX)
+    if boot_time is None:
+        print(f"Proxmox was not ready within {settings.PROXMOX_STARTUP_TIME} seconds after power on.")
+        return False
+
+    boot_history.record(boot_time)
+    print(f"Proxmox ready {boot_time:.1f} seconds after power on. Boot history: {boot_history.summary()}")
+    return True
+
+async def wait_for_host_ready():
+    # Everyone waits on the boot in progress, True once the node answers
+    return await host_lifecycle.wait_ready()
+
+async def refresh_host_lifecycle():
+    # Only a power read ends a shutdown, and the watcher may be off, so ask the BMC
+    # before a start or boot is refused for it
+    if host_lifecycle.state != SHUTTING_DOWN:
+        return
+    try:
+        host_power = await ipmi.power_state(max_age=0)
+    except Exception as e:
+        print(f"Failed to read chassis status: {str(e)}")
+        return
+    host_lifecycle.observe(host_power=host_power)
+
+def snapshot_is_fresh():
+    return settings.WATCHER_ENABLED and watcher.is_fresh()
 
 async def id_not_found(ctx):
-    idnotfoundmsg = await ctx.send(f"{ctx.author.mention}, no VM mapping found for your Discord ID.")
-    if DISCORD_DELETE_MESSAGES:
-        await asyncio.sleep(30)
-        await idnotfoundmsg.delete()
+    await notify(ctx, f"{ctx.author.mention}, no VM mapping found for your Discord ID.", 30)
+
+async def resolve_user_vms(ctx, vm_id: str = None):
+    # The user's VMs, or just vm_id if given and it belongs to them
+    vm_ids = user_vm_ids(ctx.author.id)
+    if not vm_ids:
+        await id_not_found(ctx)
+        return []
+    if vm_id is None:
+        return vm_ids
+    if str(vm_id) not in vm_ids:
+        await notify(ctx, f"{ctx.author.mention}, VM {vm_id} is not mapped to your Discord ID.", 30)
+        return []
+    return [str(vm_id)]
 
 async def check_proxmox_status(ctx, direct_command=False):
     try:
         discord_user_id = str(ctx.author.id)
-        vm_id = discord_to_vm_mapping.get(discord_user_id)
 
-        if vm_id:
-            proxmox_url = f"{PROXMOX_BASE_URL}/nodes/{PROXMOX_NODE_NAME}/status"
-            headers = {"Authorization": f"PVEAPIToken={PROXMOX_USERNAME}@{PROXMOX_REALM}!{PROXMOX_TOKEN_NAME}={PROXMOX_TOKEN}"}
+        if user_vm_ids(discord_user_id):
+            if direct_command and host_lifecycle.state == BOOTING:
+                return None  # The boot in progress tells when the node answers
+            if direct_command and snapshot_is_fresh():
+                snapshot = watcher.snapshot
+                if snapshot.proxmox_ready:
+                    return snapshot.node_response
+                if snapshot.host_power is False:
+                    return None  # Host is known to be off, don't wait on a connection timeout
+            if ipmi.cached_power_state() is False:
+                return None
 
             try:
-                # todo: find a way to suppress ssl warning
-                response = requests.get(proxmox_url, headers=headers, verify=False, timeout=5)
-            except requests.exceptions.ConnectTimeout:
-                error_message = f"{ctx.author.mention}, failed to connect to Proxmox: Connection timed out."
-                error_msg = await ctx.send(error_message)
-                async def delete_error_message(error_msg):
-                    if DISCORD_DELETE_MESSAGES:
-                        await asyncio.sleep(30)
-                        await error_msg.delete()
-                asyncio.create_task(delete_error_message(error_msg))
+                response = await fetch_node_status()
+            except CircuitOpenError:
+                host_lifecycle.observe(proxmox_ready=False)
+                return None  # Known to be unreachable, answer right away
+            except ProxmoxConnectionError as e:
+                host_lifecycle.observe(proxmox_ready=False)
+                await notify(ctx, f"{ctx.author.mention}, failed to connect to Proxmox: {e}", 30, failed=True)
                 return None
             except Exception as e:
                 print(f"Error in check_proxmox_status: {str(e)}")
                 return None
 
             if response.status_code == 200:
+                host_lifecycle.observe(proxmox_ready=True)
                 if direct_command:
                     return response  # Return the full response for direct commands
 
@@ -120,31 +564,31 @@ async def check_proxmox_status(ctx, direct_command=False):
         print(f"Error in check_proxmox_status: {str(e)}")
         return None
 
-async def check_vm_status(ctx):
-    discord_user_id = str(ctx.author.id)
-    vm_id = discord_to_vm_mapping.get(discord_user_id)
+async def check_vm_status(ctx, vm_id):
+    if snapshot_is_fresh() and str(vm_id) in watcher.snapshot.vm_states:
+        return watcher.snapshot.vm_states[str(vm_id)]
 
-    if vm_id:
-        proxmox_url = f"{PROXMOX_BASE_URL}/nodes/{PROXMOX_NODE_NAME}/qemu/{vm_id}/status/current"
-        headers = {"Authorization": f"PVEAPIToken={PROXMOX_USERNAME}@{PROXMOX_REALM}!{PROXMOX_TOKEN_NAME}={PROXMOX_TOKEN}"}
-        response = requests.get(proxmox_url, headers=headers, verify=False)
+    try:
+        response = await fetch_vm_status(vm_id)
+    except ProxmoxConnectionError as e:
+        print(f"Failed to get VM status: {e}")
+        return None
 
-        if response.status_code == 200:
-            vm_status = response.json().get('data', {}).get('status', '')
-            return vm_status
-        else:
-            #todo: tag user in message and delete message after 30 seconds
-            error_message = f"Failed to get VM status. Error: {response.status_code}, Response: {response.text}"
-            await ctx.send(error_message)
-            print(error_message)
+    if response.status_code == 200:
+        vm_status = response.json().get('data', {}).get('status', '')
+        return vm_status
     else:
-        await id_not_found(ctx)
+        error_message = f"{ctx.author.mention}, failed to get status of VM {vm_id}. Error: {response.status_code}, Response: {response.text}"
+        await notify(ctx, error_message, 30, failed=True)
+        print(error_message)
 
 async def check_vm_status_by_id(vm_id):
     if vm_id:
-        proxmox_url = f"{PROXMOX_BASE_URL}/nodes/{PROXMOX_NODE_NAME}/qemu/{vm_id}/status/current"
-        headers = {"Authorization": f"PVEAPIToken={PROXMOX_USERNAME}@{PROXMOX_REALM}!{PROXMOX_TOKEN_NAME}={PROXMOX_TOKEN}"}
-        response = requests.get(proxmox_url, headers=headers, verify=False)
+        try:
+            response = await fetch_vm_status(vm_id)
+        except ProxmoxConnectionError as e:
+            print(f"Failed to get VM status: {e}")
+            return None
 
         if response.status_code == 200:
             vm_status = response.json().get('data', {}).get('status', '')
@@ -158,64 +602,106 @@ async def check_vm_status_by_id(vm_id):
         print("No VM ID provided.")
         return None
 
-async def turn_on_vm(ctx):
-    # Turn on Proxmox VM based on the user's Discord ID
-    discord_user_id = str(ctx.author.id)
-    vm_id = discord_to_vm_mapping.get(discord_user_id)
+async def get_vm_statuses(vm_ids):
+    # Returns {vm_id: status} for the given VMs using a single listing of the cluster.
+    # Returns None if Proxmox can't be reached at all.
+    vm_ids = [str(vm_id) for vm_id in vm_ids if vm_id]
+    try:
+        resources = await fetch_cluster_vms()
+    except ProxmoxConnectionError as e:
+        print(f"Failed to list VMs: {e}")
+        return None
 
-    if vm_id:
-        proxmox_url = f"{PROXMOX_BASE_URL}/nodes/{PROXMOX_NODE_NAME}/qemu/{vm_id}/status/start"
-        headers = {"Authorization": f"PVEAPIToken={PROXMOX_USERNAME}@{PROXMOX_REALM}!{PROXMOX_TOKEN_NAME}={PROXMOX_TOKEN}"}
-        response = requests.post(proxmox_url, headers=headers, verify=False)
+    if resources is not None:
+        listed = {str(vm.get('vmid')): vm.get('status', '') for vm in resources}
+        return {vm_id: listed.get(vm_id) for vm_id in vm_ids}
 
-        if response.status_code == 200:
-            startmessage = await ctx.send(f"{ctx.author.mention}, VM started successfully.")
-            if DISCORD_DELETE_MESSAGES:
-                await asyncio.sleep(30)
-                await startmessage.delete()
-        else:
-            startfailmsg = await ctx.send(f"{ctx.author.mention}, failed to start VM. Error: {response.text}")
-            if DISCORD_DELETE_MESSAGES:
-                await asyncio.sleep(30)
-                await startfailmsg.delete()
-    else:
-        await id_not_found(ctx)
+    # Listing is unavailable (e.g. token lacks permission on the cluster), ask for each VM instead
+    semaphore = asyncio.Semaphore(settings.PROXMOX_MAX_CONCURRENCY)
 
-async def shut_down_vm(ctx):
-    # Shut down Proxmox VM based on the user's Discord ID
-    discord_user_id = str(ctx.author.id)
-    vm_id = discord_to_vm_mapping.get(discord_user_id)
+    async def fetch(vm_id):
+        async with semaphore:
+            return await check_vm_status_by_id(vm_id)
 
-    if vm_id:
-        proxmox_url = f"{PROXMOX_BASE_URL}/nodes/{PROXMOX_NODE_NAME}/qemu/{vm_id}/status/shutdown"
-        headers = {"Authorization": f"PVEAPIToken={PROXMOX_USERNAME}@{PROXMOX_REALM}!{PROXMOX_TOKEN_NAME}={PROXMOX_TOKEN}"}
-        response = requests.post(proxmox_url, headers=headers, verify=False)
+    statuses = await asyncio.gather(*(fetch(vm_id) for vm_id in vm_ids))
+    return dict(zip(vm_ids, statuses))
 
-        if response.status_code == 200:
-            shutdownmessge = await ctx.send(f"{ctx.author.mention}, VM is shutting down gracefully. Please wait.")
-            if DISCORD_DELETE_MESSAGES:
-                await asyncio.sleep(30)
-                await shutdownmessge.delete()
-        else:
-            shutdownfailmsg = await ctx.send(f"{ctx.author.mention}, failed to shut down VM. Error: {response.text}")
-            if DISCORD_DELETE_MESSAGES:
-                await asyncio.sleep(30)
-                await shutdownfailmsg.delete()
+async def send_vm_action(vm_id, action):
+    return await vm_request(vm_id, lambda node: proxmox.vm_action(node, vm_id, action))
+
+async def fetch_task_status(node, upid):
+    response = await proxmox.get_task_status(node, upid)
+    return response.data if response.status_code == 200 else None
+
+async def follow_vm_operation(operation, expected_state):
+    # Waits for a submitted operation, keeping the cache and the watcher out of its way
+    invalidate_vm_status(operation.vm_id)
+    watcher.forget_vm(operation.vm_id)
+    watcher.expect(("vm", str(operation.vm_id)), expected_state)
+    operation = await asyncio.shield(operation.task)
+    invalidate_vm_status(operation.vm_id)
+    # The task is done, drops the VM and its expectation so the watcher can slow down again
+    watcher.forget_vm(operation.vm_id)
+    return operation
+
+async def run_vm_action(ctx, vm_id, action, verb, done_text, expected_state):
+    operation, is_new = vm_operations.submit(vm_id, action)
+    if not is_new:
+        await notify(ctx, f"{ctx.author.mention}, a request to {verb} VM {vm_id} is already in progress.", 30)
+        return operation
+
+    operation = await follow_vm_operation(operation, expected_state)
+
+    if operation.ok:
+        await notify(ctx, f"{ctx.author.mention}, VM {vm_id} {done_text} in {operation.duration:.0f} seconds.", 30)
     else:
-        await id_not_found(ctx)
+        await notify(ctx, f"{ctx.author.mention}, failed to {verb} VM {vm_id}. {operation.describe_failure()}", 30, failed=True)
+    return operation
+
+async def turn_on_vm(ctx, vm_id):
+    # Turn on Proxmox VM, on whichever cluster node it currently lives
+    await refresh_host_lifecycle()
+    try:
+        with host_lifecycle.pending_start():
+            return await run_vm_action(ctx, vm_id, "start", "start", "started successfully", "running")
+    except HostUnavailable as e:
+        await notify(ctx, f"{ctx.author.mention}, VM {vm_id} can't be started, {e}.", 30, failed=True)
+
+async def shut_down_vm(ctx, vm_id):
+    # Shut down Proxmox VM, on whichever cluster node it currently lives
+    if not vm_operations.pending(vm_id):
+        await notify(ctx, f"{ctx.author.mention}, VM {vm_id} is shutting down gracefully. Please wait.", 30)
+    return await run_vm_action(ctx, vm_id, "shutdown", "shut down", "shut down", "stopped")
 
 async def power_on_host(ctx):
+    if host_lifecycle.state == BOOTING:
+        await notify(ctx, f"{ctx.author.mention}, the host is already booting, your request continues once it is ready.",
+                     settings.PROXMOX_STARTUP_TIME)
+        return True
+    await refresh_host_lifecycle()
     try:
-        ipmi.chassis_control(IPMI_POWER_ON)        
-        poweronmsg = await ctx.send(f"{ctx.author.mention}, server is powering on. Please wait.")
-        if DISCORD_DELETE_MESSAGES:
-            await asyncio.sleep(PROXMOX_STARTUP_TIME)
-            await poweronmsg.delete()
+        await host_lifecycle.boot()
+        await notify(ctx, f"{ctx.author.mention}, server is powering on. Please wait.", settings.PROXMOX_STARTUP_TIME)
+        return True
     except Exception as e:
-        poweronfailmsg = await ctx.send(f"{ctx.author.mention}, failed to power on server. Error: {str(e)}")
-        if DISCORD_DELETE_MESSAGES:
-            await asyncio.sleep(60)
-            await poweronfailmsg.delete()
+        await notify(ctx, f"{ctx.author.mention}, failed to power on server. Error: {str(e)}", 60, failed=True)
+        return False
+
+async def soft_power_off_host():
+    # Raises HostUnavailable while the host boots, VM starts are pending or another power off
+    # is under way. Returns False without sending anything if the host is already off.
+    if not host_lifecycle.begin_shutdown():
+        return False
+    watcher.expect("host", False)
+    watcher.expect("proxmox", False)
+    try:
+        await ipmi.chassis_control(IPMI_POWER_OFF_SOFT)
+    except Exception:
+        host_lifecycle.cancel_shutdown()
+        raise
+    invalidate_host_status()
+    idle_detector.reset()
+    return True
 
 async def power_off_host(ctx):
     # Check Proxmox server status
@@ -223,299 +709,460 @@ async def power_off_host(ctx):
 
     if server_status_response is not None and server_status_response.status_code == 200:
         # Proxmox server is online, proceed to check VM status
-        running_vms = []
-
-        for discord_user_id, vm_id in discord_to_vm_mapping.items():
-            vm_status = await check_vm_status_by_id(vm_id)
-
-            if vm_status == 'running':
-                running_vms.append(discord_user_id)
-
-        if not running_vms:
+        vm_statuses = await get_vm_statuses(all_mapped_vm_ids())
+        if vm_statuses is None:
+            # Without a listing the VMs may well be running
+            await notify(ctx, f"{ctx.author.mention}, Proxmox server is not responding. It may be already offline.", 60, failed=True)
+            return
+        # Only VMs on the node we are about to power off matter
+        vm_statuses = {vm_id: vm_status for vm_id, vm_status in vm_statuses.items()
+                       if vm_index.cached_node(vm_id) in (None, settings.PROXMOX_NODE_NAME)}
+        running_vms = sorted({discord_user_id for vm_id, vm_status in vm_statuses.items()
+                              if vm_status == 'running' for discord_user_id in vm_owners(vm_id)})
+        # A VM whose status couldn't be read is not known to be stopped
+        unknown_vms = sorted(vm_id for vm_id, vm_status in vm_statuses.items() if vm_status is None)
+
+        if unknown_vms and not running_vms:
+            await notify(ctx, f"{ctx.author.mention}, the state of VM {', '.join(unknown_vms)} is unknown. You can't power off until all VMs are known to be off.", 60, failed=True)
+        elif not running_vms:
             # All VMs are already powered off, proceed with power off the host
             try:
-                ipmi.chassis_control(IPMI_POWER_OFF_SOFT)
-                poweroffmsg = await ctx.send(f"{ctx.author.mention}, server is powering off gracefully. Please wait.")
-                if DISCORD_DELETE_MESSAGES:
-                    await asyncio.sleep(180)
-                    await poweroffmsg.delete()
+                if await soft_power_off_host():
+                    await notify(ctx, f"{ctx.author.mention}, server is powering off gracefully. Please wait.", 180)
+                else:
+                    await notify(ctx, f"{ctx.author.mention}, server is already off.", 60)
+            except HostUnavailable as e:
+                await notify(ctx, f"{ctx.author.mention}, the server can't be powered off now, {e}.", 60, failed=True)
             except Exception as e:
-                powerofferrormsg = await ctx.send(f"{ctx.author.mention}, failed to power off server. Error: {str(e)}")
-                if DISCORD_DELETE_MESSAGES:
-                    await asyncio.sleep(60)
-                    await powerofferrormsg.delete()
+                await notify(ctx, f"{ctx.author.mention}, failed to power off server. Error: {str(e)}", 60, failed=True)
         else:
             # Highlight users with running VMs
             users_with_running_vms = ", ".join(f"<@{user_id}>" for user_id in running_vms)
-            runningvmsmsg = await ctx.send(f"{ctx.author.mention}, the following VMs are still running: {users_with_running_vms}. You can't power off until all VMs are off.")
-            if DISCORD_DELETE_MESSAGES:
-                await asyncio.sleep(60)
-                await runningvmsmsg.delete()
+            await notify(ctx, f"{ctx.author.mention}, the following VMs are still running: {users_with_running_vms}. You can't power off until all VMs are off.", 60)
     elif server_status_response is None:
         # Proxmox server is not ready, inform the user
-        poweroffresponseerrormsg = await ctx.send(f"{ctx.author.mention}, Proxmox server is not responding. It may be already offline.")
-        if DISCORD_DELETE_MESSAGES:
-            await asyncio.sleep(60)
-            await poweroffresponseerrormsg.delete()
+        await notify(ctx, f"{ctx.author.mention}, Proxmox server is not responding. It may be already offline.", 60, failed=True)
     else:
         # Handle other cases where Proxmox server status is not 200
-        powerofferrorothermsg = await ctx.send(f"{ctx.author.mention}, failed to retrieve Proxmox server status.")
-        if DISCORD_DELETE_MESSAGES:
-            await asyncio.sleep(60)
-            await powerofferrorothermsg.delete()
+        await notify(ctx, f"{ctx.author.mention}, failed to retrieve Proxmox server status.", 60, failed=True)
 
-async def offer_vm_power_options(ctx):
+async def offer_vm_power_options(ctx, vm_id):
     # Check the current status of the VM
-    vm_status = await check_vm_status(ctx)
+    vm_status = await check_vm_status(ctx, vm_id)
 
     if vm_status == 'running':
-        message = await ctx.send(f"{ctx.author.mention}, Proxmox server is online. React with ⏹️ to shut down your VM.")
-        await message.add_reaction("⏹️")  # Add the stop button emoji as a reaction
-        expected_reaction = "⏹️"
+        content = f"{ctx.author.mention}, Proxmox server is online. Press ⏹️ to shut down VM {vm_id}."
+        choices = [("shutdown", "Shut down", "⏹️", discord.ButtonStyle.danger)]
         opposite_action = shut_down_vm
     else:
-        message = await ctx.send(f"{ctx.author.mention}, Proxmox server is online. React with ▶️ to start your VM.")
-        await message.add_reaction("▶️")  # Add the play button emoji as a reaction
-        expected_reaction = "▶️"
+        content = f"{ctx.author.mention}, Proxmox server is online. Press ▶️ to start VM {vm_id}."
+        choices = [("start", "Start", "▶️", discord.ButtonStyle.success)]
         opposite_action = turn_on_vm
 
-    def check(reaction, user):
-        return user == ctx.author and str(reaction.emoji) == expected_reaction
-
-    try:
-        reaction, _ = await bot.wait_for("reaction_add", timeout=60.0, check=check)
-    except asyncio.TimeoutError:
-        if DISCORD_DELETE_MESSAGES:
-            await message.delete()
-        timeoutmessage = await ctx.send(f"{ctx.author.mention}, reaction timed out. No VM action will be taken.")
-        if DISCORD_DELETE_MESSAGES:
-            await asyncio.sleep(30)
-            await timeoutmessage.delete()
+    choice = await prompt_user(ctx, content, choices, timeout=60.0)
+    if choice is None:
+        await notify(ctx, f"{ctx.author.mention}, prompt timed out. No VM action will be taken.", 30)
         return
-    else:
-        if str(reaction.emoji) == expected_reaction:
-            if DISCORD_DELETE_MESSAGES:
-                await message.delete()
-            await opposite_action(ctx)
-        else:
-            if DISCORD_DELETE_MESSAGES:
-                await message.delete()
-            invreactionmsg = await ctx.send(f"{ctx.author.mention}, invalid reaction. No VM action will be taken.")
-            if DISCORD_DELETE_MESSAGES:
-                await asyncio.sleep(30)
-                await invreactionmsg.delete()
-            return
+    await opposite_action(ctx, vm_id)
 
 async def offer_host_power_options(ctx):
-    if not DISCORD_POWER_OPTIONS:
-        poweroptionsmsg = await ctx.send(f"{ctx.author.mention}, Host power options are disabled. Please reach out to the server admin if you need to change the power state of the host.")
-        if DISCORD_DELETE_MESSAGES:
-            await asyncio.sleep(60)
-            await poweroptionsmsg.delete()
+    if not settings.DISCORD_POWER_OPTIONS:
+        await notify(ctx, f"{ctx.author.mention}, Host power options are disabled. Please reach out to the server admin if you need to change the power state of the host.", 60)
         return
+    if host_lifecycle.state == BOOTING:
+        # Someone else started it, join that boot instead of asking
+        await power_on_host(ctx)
+        return "powered_on"
 
-    message = await ctx.send(f"{ctx.author.mention}, Do you want to start the host? (React with ⚡ to start or ❌ to cancel)")
-    # Add reactions to the message
-    await message.add_reaction("⚡")
-    await message.add_reaction("❌")
-
-    def check_reaction(reaction, user):
-        return user == ctx.author and str(reaction.emoji) in ["⚡", "❌"] and reaction.message.id == message.id
+    choices = [
+        ("start", "Start host", "⚡", discord.ButtonStyle.success),
+        ("cancel", "Cancel", "❌", discord.ButtonStyle.secondary),
+    ]
+    choice = await prompt_user(ctx, f"{ctx.author.mention}, Do you want to start the host?", choices, timeout=30.0)
 
-    try:
-        reaction, _ = await bot.wait_for("reaction_add", timeout=30.0, check=check_reaction)
-    except asyncio.TimeoutError:
-        if DISCORD_DELETE_MESSAGES:
-            await message.delete()
-        powerreactiontimeoutmsg = await ctx.send(f"{ctx.author.mention}, Reaction timed out. No action will be taken.")
-        if DISCORD_DELETE_MESSAGES:
-            await asyncio.sleep(30)
-            await powerreactiontimeoutmsg.delete()
+    if choice is None:
+        await notify(ctx, f"{ctx.author.mention}, Prompt timed out. No action will be taken.", 30)
         return
+    elif choice == "start":
+        if await power_on_host(ctx):
+            return "powered_on"
     else:
-        if str(reaction.emoji) == "⚡":
-            if DISCORD_DELETE_MESSAGES:
-                await message.delete()
-            await power_on_host(ctx)
-        elif str(reaction.emoji) == "❌":
-            if DISCORD_DELETE_MESSAGES:
-                await message.delete()
-            powerreactionmsg = await ctx.send(f"{ctx.author.mention}, No action will be taken.")
-            async def delete_powerreactionmsg(powerreactionmsg):
-                if DISCORD_DELETE_MESSAGES:
-                    await asyncio.sleep(30)
-                    await powerreactionmsg.delete()
-            asyncio.create_task(delete_powerreactionmsg(powerreactionmsg))
-            return "reaction_cancelled"           
-        else:
-            if DISCORD_DELETE_MESSAGES:
-                await message.delete()
-            powerreactionothermsg = await ctx.send(f"{ctx.author.mention}, Invalid reaction. No action will be taken.")
-            async def delete_powerreactionothermsg(powerreactionothermsg):
-                if DISCORD_DELETE_MESSAGES:
-                    await asyncio.sleep(30)
-                    await powerreactionothermsg.delete()
-            asyncio.create_task(delete_powerreactionothermsg(powerreactionothermsg))
-            return "reaction_cancelled"
-
-
-@bot.event
+        await notify(ctx, f"{ctx.author.mention}, No action will be taken.", 30)
+        return "reaction_cancelled"
+
+
+ready_logged = False
+
 async def on_ready():
+    global ready_logged
     print(f'We have logged in as {bot.user.name}')
-    
-    if DISCORD_CLEAR_CHANNEL:
-        channel = bot.get_channel(DISCORD_CHANNEL_ID)
-        
-        if channel:
-            try:
-                await channel.purge(check=lambda msg: not msg.pinned)
-                print(f'Cleared non-pinned messages in #{channel.name}')
-            except discord.Forbidden:
-                print(f"Bot doesn't have 'Manage Messages' permission in #{channel.name}")
-            except discord.HTTPException as e:
-                print(f"An error occurred while purging messages: {e}")
+    if not ready_logged:
+        ready_logged = True
+        print(f'Time to ready: {time.monotonic() - MODULE_LOADED_AT:.2f} seconds')
+    report_resources()
+    if settings.DISCORD_REPORT_INTERVAL and not resource_report.is_running():
+        resource_report.change_interval(minutes=settings.DISCORD_REPORT_INTERVAL)
+        resource_report.start()
+    message_scheduler.start()
+    await sync_slash_commands()
+
+    # The first iteration clears the channel right away, then once a day
+    if settings.DISCORD_CLEAR_CHANNEL and not clear_channel.is_running():
+        clear_channel.start()
+
+    if settings.WATCHER_ENABLED:
+        watcher.start()
+
+    if settings.IDLE_ENABLED and not idle_check.is_running():
+        idle_check.change_interval(seconds=settings.IDLE_CHECK_INTERVAL)
+        idle_check.start()
+
+    if settings.IPMI_TELEMETRY_INTERVAL and not sensor_telemetry.is_running():
+        sensor_telemetry.change_interval(seconds=settings.IPMI_TELEMETRY_INTERVAL)
+        sensor_telemetry.start()
+
+    usage_history.start()
+    if settings.PREWARM_ENABLED and not prewarm_check.is_running():
+        prewarm_check.change_interval(seconds=settings.PREWARM_CHECK_INTERVAL)
+        prewarm_check.start()
+
+slash_commands_synced = False
+
+async def sync_slash_commands():
+    # Registered on the channel's guild only, guild commands show up immediately
+    global slash_commands_synced
+    if not settings.DISCORD_SLASH_COMMANDS or slash_commands_synced:
+        return
+    channel = bot.get_channel(settings.DISCORD_CHANNEL_ID)
+    if channel is None:
+        return
+    try:
+        bot.tree.copy_global_to(guild=channel.guild)
+        synced = await bot.tree.sync(guild=channel.guild)
+        slash_commands_synced = True
+        print(f'Synced {len(synced)} slash commands to {channel.guild.name}')
+    except discord.HTTPException as e:
+        print(f"Failed to sync slash commands: {e}")
+
+gateway_events = EventRateCounter()
+
+async def count_gateway_event(event_type):
+    gateway_events.record(event_type)
+
+def report_resources():
+    rss = current_rss_mb()
+    rate = gateway_events.rate()
+    print(f"Resources: RSS {rss:.1f} MiB (budget {settings.DISCORD_MEMORY_BUDGET_MB} MiB), {rate:.2f} gateway events/sec, "
+          f"{len(bot.cached_messages)} cached messages, top events: {gateway_events.top()}")
+    if settings.DISCORD_MEMORY_BUDGET_MB and rss > settings.DISCORD_MEMORY_BUDGET_MB:
+        print(f"Warning: RSS {rss:.1f} MiB is over the {settings.DISCORD_MEMORY_BUDGET_MB} MiB memory budget")
+
+@tasks.loop(minutes=60)
+async def resource_report():
+    report_resources()
+
+async def only_in_bot_channel(ctx):
+    return ctx.channel.id == settings.DISCORD_CHANNEL_ID
+
+async def on_message(message):
+    # Drop everything outside the bot's channel before any command parsing
+    if message.channel.id != settings.DISCORD_CHANNEL_ID or message.author.bot:
+        return
+    await bot.process_commands(message)
+
+async def route_interaction(interaction):
+    await interaction_dispatcher.dispatch(interaction)
+
+async def track_bot_messages(message):
+    # Index everything the bot posts so channel cleanup can delete it without a history scan.
+    # Without channel cleanup nobody purges them, so they aren't kept.
+    if settings.DISCORD_CLEAR_CHANNEL and message.author == bot.user and message.channel.id == settings.DISCORD_CHANNEL_ID:
+        message_scheduler.track(message)
+
+async def read_node_samples():
+    try:
+        response = await proxmox.get_node_rrddata(settings.PROXMOX_NODE_NAME)
+    except ProxmoxConnectionError as e:
+        print(f"Failed to read node load: {e}")
+        return None
+    if response.status_code != 200 or not isinstance(response.data, list):
+        print(f"Failed to read node load. Error: {response.status_code}, Response: {response.text}")
+        return None
+    return response.data
+
+async def host_is_idle():
+    # Refreshes the detector and tells whether the host may be powered off
+    if vm_operations.pending():
+        idle_detector.note_activity()
+        return False
+    vm_statuses = await get_vm_statuses(all_mapped_vm_ids())
+    if vm_statuses is None:
+        return False  # Proxmox isn't answering, don't act on a guess
+    idle_detector.observe_vms(vm_statuses)
+    samples = await read_node_samples()
+    if samples is not None:
+        idle_detector.observe_node_samples(samples)
+    return idle_detector.is_idle()
+
+@tasks.loop(seconds=60)
+async def idle_check():
+    try:
+        if not await read_host_power():
+            idle_detector.reset()
+            return
+        if not await host_is_idle():
+            return
+
+        channel = bot.get_channel(settings.DISCORD_CHANNEL_ID)
+        if channel is None:
+            return
+        print(f"Host is idle ({idle_detector.describe()}), warning before power off")
+        choices = [("keep", "Keep it on", "✋", discord.ButtonStyle.secondary)]
+        message, choice = await interaction_dispatcher.ask(
+            channel.send, f"No VM has been running for {idle_detector.idle_for() / 60:.0f} minutes. The host will be "
+                          f"powered off in {settings.IDLE_WARNING_TIME / 60:.0f} minutes unless someone presses ✋.",
+            choices, None, timeout=settings.IDLE_WARNING_TIME)
+        schedule_delete(message, 0)
+
+        if choice is not None:
+            idle_detector.note_activity()
+            keptmsg = await channel.send(f"Idle power off cancelled, checking again in {settings.IDLE_GRACE_PERIOD / 60:.0f} minutes.")
+            schedule_delete(keptmsg, 60)
+            return
+        # Someone may have started a VM while the warning was up
+        if not await read_host_power() or not await host_is_idle():
+            return
+
+        try:
+            if not await soft_power_off_host():
+                return
+        except HostUnavailable as e:
+            print(f"Idle power off skipped, {e}")
+            return
+        print("Host powered off after being idle")
+        idlepoweroffmsg = await channel.send("Host was idle and is powering off gracefully.")
+        schedule_delete(idlepoweroffmsg, 180)
+    except Exception as e:
+        print(f"Error in idle check: {str(e)}")
+
+@tasks.loop(seconds=60)
+async def sensor_telemetry():
+    try:
+        readings = await sensor_reader.read_all()
+    except Exception as e:
+        print(f"Failed to read sensors: {str(e)}")
+        return
+    for reading in readings:
+        if reading.value is not None:
+            ipmi_sensor_value.set(reading.value, sensor=reading.name, group=reading.group, unit=reading.unit)
+    print("Sensors: " + ", ".join(reading.describe() for reading in readings))
+
+# Commands that mean someone wants the host up
+DEMAND_COMMANDS = ("startvm", "serverstatus", "startall", "poweron")
+
+# The pre-warm boot that hasn't been used yet: {"id", "at"}
+open_prewarm = None
+prewarm_planner = PrewarmPlanner()
+
+def record_demand(ctx):
+    # Runs before the command defers, so nothing here may wait: the IPMI cache and then the
+    # watcher snapshot are used, and only if both are stale the BMC is read in the background
+    host_was_on = ipmi.cached_power_state()
+    if host_was_on is None and snapshot_is_fresh():
+        host_was_on = watcher.snapshot.host_power
+    asyncio.ensure_future(store_demand(ctx.author.id, ctx.command.name, host_was_on))
+
+async def store_demand(user_id, command, host_was_on):
+    global open_prewarm
+    if host_was_on is None:
+        # Started while the command is still deferring, well before it can change the power state
+        host_was_on = await read_host_power()
+    # Recorded even while pre-warming is off, so there is history once it is turned on
+    usage_history.record_demand(user_id, command, host_was_on)
+    if open_prewarm is not None and host_was_on:
+        # Someone found the host already up thanks to a pre-warm boot
+        saved_seconds = boot_history.median() or settings.PROXMOX_STARTUP_TIME
+        prewarm, open_prewarm = open_prewarm, None
+        try:
+            await usage_history.record_prewarm_hit(prewarm["id"], saved_seconds)
+        except Exception as e:
+            print(f"Failed to record pre-warm hit: {str(e)}")
+
+@tasks.loop(seconds=120)
+async def prewarm_check():
+    global open_prewarm
+    try:
+        await usage_history.flush()
+        host_power = await read_host_power()
+
+        if open_prewarm is not None and time.monotonic() - open_prewarm["at"] > settings.PREWARM_MAX_UNUSED * 60:
+            # Nobody came, don't keep the host running for nothing
+            open_prewarm = None
+            if host_power and not vm_operations.pending():
+                vm_statuses = await get_vm_statuses(all_mapped_vm_ids())
+                if vm_statuses is not None and 'running' not in vm_statuses.values():
+                    print(f"Pre-warmed host unused for {settings.PREWARM_MAX_UNUSED} minutes, powering off")
+                    try:
+                        await soft_power_off_host()
+                    except HostUnavailable as e:
+                        print(f"Pre-warm power off skipped, {e}")
+            return
+        if host_power is not False or open_prewarm is not None:
+            return
+
+        today = datetime.datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+        if await usage_history.prewarms_since(today.timestamp()) >= settings.PREWARM_MAX_PER_DAY:
+            return
+        histogram, observed_weeks = await usage_history.demand_histogram(settings.PREWARM_HISTORY_WEEKS)
+        lead_time = (boot_history.median() or settings.PROXMOX_STARTUP_TIME) + settings.PREWARM_LEAD_MARGIN
+        due = prewarm_planner.due_slot(histogram, observed_weeks, lead_time)
+        if due is None:
+            return
+
+        slot, probability = due
+        print(f"Pre-warming the host for expected demand at {slot[1]:02d}:00 ({probability:.0%} of past weeks)")
+        # Commands arriving during the boot join it like any other
+        await host_lifecycle.boot()
+        prewarm_id = await usage_history.record_prewarm(slot, probability)
+        open_prewarm = {"id": prewarm_id, "at": time.monotonic()}
+    except Exception as e:
+        print(f"Error in pre-warm check: {str(e)}")
 
 @tasks.loop(hours=24)
 async def clear_channel():
 
-    if DISCORD_CLEAR_CHANNEL:
-        channel = bot.get_channel(DISCORD_CHANNEL_ID)
+    if settings.DISCORD_CLEAR_CHANNEL:
+        channel = bot.get_channel(settings.DISCORD_CHANNEL_ID)
 
         if channel:
             try:
-                await channel.purge(check=lambda msg: not msg.pinned)
-                print(f'Cleared non-pinned messages in #{channel.name}')
+                if clear_channel.current_loop == 0:
+                    # Messages from before this start aren't in the index yet, scan the history once
+                    await channel.purge(check=lambda msg: not msg.pinned)
+                    print(f'Cleared non-pinned messages in #{channel.name}')
+                else:
+                    deleted = await message_scheduler.purge_tracked(channel)
+                    print(f'Cleared {deleted} bot messages in #{channel.name}')
             except discord.Forbidden:
                 print(f"Bot doesn't have 'Manage Messages' permission in #{channel.name}")
             except discord.HTTPException as e:
                 print(f"An error occurred while purging messages: {e}")
 
-@bot.command(name='serverstatus', brief="Check Proxmox server status.")
-async def server_status_command(ctx):
-    if DISCORD_DELETE_MESSAGES:
-        await ctx.message.delete()
-    response = await check_proxmox_status(ctx, direct_command=True)
-    if response is not None and response.status_code == 200:
-        await offer_vm_power_options(ctx)
-    elif response is None:
-        statusoffermsg = await ctx.send(f"{ctx.author.mention}, Proxmox server may be offline.")
-        async def delete_statusoffermsg(statusoffermsg):
-            if DISCORD_DELETE_MESSAGES:
-                await asyncio.sleep(30)
-                await statusoffermsg.delete()
-        asyncio.create_task(delete_statusoffermsg(statusoffermsg))
-        offerpower = await offer_host_power_options(ctx)
-        if offerpower == "reaction_cancelled":
+@commands.hybrid_command(name='serverstatus', brief="Check Proxmox server status.")
+async def server_status_command(ctx, vm_id: str = None):
+    delete_command_message(ctx)
+    await ctx.defer()
+    async with live_progress(ctx, "Server status"):
+        vm_ids = await resolve_user_vms(ctx, vm_id)
+        if not vm_ids:
             return
-        await asyncio.sleep(PROXMOX_STARTUP_TIME)
+
         response = await check_proxmox_status(ctx, direct_command=True)
-        if response is None:
-            statuserrormsg = await ctx.send(f"{ctx.author.mention}, Something went wrong. Please reach out to the server admin.")
-            if DISCORD_DELETE_MESSAGES:
-                await asyncio.sleep(60)
-                await statuserrormsg.delete()
-        elif response.status_code == 200:
-            await offer_vm_power_options(ctx)
+        if response is not None and response.status_code == 200:
+            await asyncio.gather(*(offer_vm_power_options(ctx, vm_id) for vm_id in vm_ids))
+        elif response is None:
+            if host_lifecycle.state != BOOTING:
+                await notify(ctx, f"{ctx.author.mention}, Proxmox server may be offline.", 30)
+            offerpower = await offer_host_power_options(ctx)
+            if offerpower != "powered_on":
+                return
+            await wait_for_host_ready()
+            response = await check_proxmox_status(ctx, direct_command=True)
+            if response is None:
+                await notify(ctx, f"{ctx.author.mention}, Something went wrong. Please reach out to the server admin.", 60, failed=True)
+            elif response.status_code == 200:
+                await asyncio.gather(*(offer_vm_power_options(ctx, vm_id) for vm_id in vm_ids))
+        else:
+            await notify(ctx, f"{ctx.author.mention}, Failed to retrieve Proxmox server status.", 60, failed=True)
+
+async def start_vm_if_stopped(ctx, vm_id):
+    vm_status = await check_vm_status(ctx, vm_id)
+
+    if vm_status == 'running':
+        await notify(ctx, f"{ctx.author.mention}, VM {vm_id} is already running.", 30)
     else:
-        statuserrorothermsg = await ctx.send(f"{ctx.author.mention}, Failed to retrieve Proxmox server status.")
-        if DISCORD_DELETE_MESSAGES:
-            await asyncio.sleep(60)
-            await statuserrorothermsg.delete()
-
-@bot.command(name='startvm', brief="Start your Proxmox VM.")
-async def start_vm_command(ctx):
-    if DISCORD_DELETE_MESSAGES:
-        await ctx.message.delete()
+        await turn_on_vm(ctx, vm_id)
+
+async def start_vms_when_ready(ctx, vm_ids):
     # Check Proxmox server status
     server_status_response = await check_proxmox_status(ctx, direct_command=True)
-    
+
     if server_status_response is not None and server_status_response.status_code == 200:
-        # Proxmox server is online, proceed to check VM status
-        vm_status = await check_vm_status(ctx)
-        
-        if vm_status == 'running':
-            vmrunningmsg = await ctx.send(f"{ctx.author.mention}, VM is already running.")
-            if DISCORD_DELETE_MESSAGES:
-                await asyncio.sleep(30)
-                await vmrunningmsg.delete()
-        else:
-            await turn_on_vm(ctx)
+        # Proxmox server is online, start the VMs in parallel, they may live on different nodes
+        await asyncio.gather(*(start_vm_if_stopped(ctx, vm_id) for vm_id in vm_ids))
     elif server_status_response is None:
-        poweroffermsg = await ctx.send(f"{ctx.author.mention}, Proxmox server may be offline. Would you like to try to power on the host?")
-        async def delete_poweroffermsg(poweroffermsg):
-            if DISCORD_DELETE_MESSAGES:
-                await asyncio.sleep(30)
-                await poweroffermsg.delete()
-        asyncio.create_task(delete_poweroffermsg(poweroffermsg))
-        await offer_host_power_options(ctx)
+        if host_lifecycle.state != BOOTING:
+            await notify(ctx, f"{ctx.author.mention}, Proxmox server may be offline. Would you like to try to power on the host?", 30)
+        offerpower = await offer_host_power_options(ctx)
+        if offerpower != "powered_on":
+            return
+        # Every start queued during the boot goes out together once the node answers
+        await wait_for_host_ready()
         server_status_response = await check_proxmox_status(ctx, direct_command=True)
         if server_status_response is None:
-            poweroffererrormsg = await ctx.send(f"{ctx.author.mention}, something went wrong. Please reach out to the server admin.")
-            if DISCORD_DELETE_MESSAGES:
-                await asyncio.sleep(60)
-                await poweroffererrormsg.delete()
+            await notify(ctx, f"{ctx.author.mention}, something went wrong. Please reach out to the server admin.", 60, failed=True)
         elif server_status_response.status_code == 200:
-            vm_status = await check_vm_status(ctx)
-            if vm_status == 'running':
-                vmrunningmsg = await ctx.send(f"{ctx.author.mention}, VM is already running.")
-                if DISCORD_DELETE_MESSAGES:
-                    await asyncio.sleep(30)
-                    await vmrunningmsg.delete()
-            else:
-                await turn_on_vm(ctx)
-                vmstartmsg = await ctx.send(f"{ctx.author.mention}, VM started successfully.")
-                if DISCORD_DELETE_MESSAGES:
-                    await asyncio.sleep(30)
-                    await vmstartmsg.delete()
+            await asyncio.gather(*(start_vm_if_stopped(ctx, vm_id) for vm_id in vm_ids))
     else:
         # Handle other cases where Proxmox server status is not 200
-        startvmerrorothermsg = await ctx.send(f"{ctx.author.mention}, failed to retrieve Proxmox server status.")
-        if DISCORD_DELETE_MESSAGES:
-            await asyncio.sleep(60)
-            await startvmerrorothermsg.delete()
-
-@bot.command(name='stopvm', brief="Stop your Proxmox VM.")
-async def stop_vm_command(ctx):
-    if DISCORD_DELETE_MESSAGES:
-        await ctx.message.delete()
-    # Check Proxmox server status
-    server_status_response = await check_proxmox_status(ctx, direct_command=True)
-    
-    if server_status_response.status_code == 200:
-        # Proxmox server is online, proceed to check VM status
-        vm_status = await check_vm_status(ctx)
-        
-        if vm_status != 'running':
-            notrunningmsg = await ctx.send(f"{ctx.author.mention}, VM is not running.")
-            if DISCORD_DELETE_MESSAGES:
-                await asyncio.sleep(30)
-                await notrunningmsg.delete()
-        else:
-            await shut_down_vm(ctx)
+        await notify(ctx, f"{ctx.author.mention}, failed to retrieve Proxmox server status.", 60, failed=True)
+
+@commands.hybrid_command(name='startvm', brief="Start your Proxmox VM (or all of them).")
+async def start_vm_command(ctx, vm_id: str = None):
+    delete_command_message(ctx)
+    await ctx.defer()
+    async with live_progress(ctx, "Start VM"):
+        vm_ids = await resolve_user_vms(ctx, vm_id)
+        if not vm_ids:
+            return
+
+        # Registered as pending from here on, the host won't be powered off under it
+        await refresh_host_lifecycle()
+        try:
+            with host_lifecycle.pending_start():
+                await start_vms_when_ready(ctx, vm_ids)
+        except HostUnavailable as e:
+            await notify(ctx, f"{ctx.author.mention}, VMs can't be started now, {e}.", 60, failed=True)
+
+async def stop_vm_if_running(ctx, vm_id):
+    vm_status = await check_vm_status(ctx, vm_id)
+
+    if vm_status != 'running':
+        await notify(ctx, f"{ctx.author.mention}, VM {vm_id} is not running.", 30)
     else:
-        stoperrormsg = await ctx.send(f"{ctx.author.mention}, Proxmox server is not responding. It may be already offline.")
-        if DISCORD_DELETE_MESSAGES:
-            await asyncio.sleep(60)
-            await stoperrormsg.delete()
+        await shut_down_vm(ctx, vm_id)
+
+@commands.hybrid_command(name='stopvm', brief="Stop your Proxmox VM (or all of them).")
+async def stop_vm_command(ctx, vm_id: str = None):
+    delete_command_message(ctx)
+    await ctx.defer()
+    async with live_progress(ctx, "Stop VM"):
+        vm_ids = await resolve_user_vms(ctx, vm_id)
+        if not vm_ids:
+            return
+
+        # Check Proxmox server status
+        server_status_response = await check_proxmox_status(ctx, direct_command=True)
+
+        if server_status_response is not None and server_status_response.status_code == 200:
+            # Proxmox server is online, stop the VMs in parallel
+            await asyncio.gather(*(stop_vm_if_running(ctx, vm_id) for vm_id in vm_ids))
+        else:
+            await notify(ctx, f"{ctx.author.mention}, Proxmox server is not responding. It may be already offline.", 60, failed=True)
 
-@bot.event
 async def on_command_error(ctx, error):
-    if DISCORD_DELETE_MESSAGES:
-        try:
-            await ctx.message.delete()
-        except discord.NotFound:
-            # The message might have been deleted already, ignore the error
-            pass
+    # The message might have been deleted already, the scheduler ignores that
+    delete_command_message(ctx)
+    record_command(ctx, type(error).__name__)
 
     if isinstance(error, commands.CommandNotFound):
         invalid_cmd_msg = await ctx.send(f"{ctx.author.mention}, invalid command. Here is a list of available commands:\n```{', '.join([command.name for command in bot.commands])}``` use the `!help` command for more information.")
-
-        if DISCORD_DELETE_MESSAGES:
-            await asyncio.sleep(60)
-            try:
-                await invalid_cmd_msg.delete()
-            except discord.NotFound:
-                pass
+        schedule_delete(invalid_cmd_msg, 60)
+    elif isinstance(error, NotAdmin):
+        await notify(ctx, f"{ctx.author.mention}, this command is limited to bot admins.", 30)
+    elif isinstance(error, commands.CheckFailure):
+        # Slash commands can be used anywhere in the guild, the bot only works in its channel
+        await ctx.send(f"{ctx.author.mention}, please use the bot in <#{settings.DISCORD_CHANNEL_ID}>.", ephemeral=True)
     else:
         print(f"Error in command {ctx.command} for user {ctx.author}: {error}")
         await ctx.send(f"An error occurred while processing the command. Please check the logs for more details.")
@@ -525,30 +1172,462 @@ async def on_command_error(ctx, error):
         traceback.print_exc()
 
 
-@bot.command(name='poweron', brief="Power on the Proxmox host.")
+@commands.hybrid_command(name='poweron', brief="Power on the Proxmox host.")
 async def power_on_command(ctx):
-    if DISCORD_DELETE_MESSAGES:
-        await ctx.message.delete()
-
-    if DISCORD_POWER_OPTIONS:
-        await power_on_host(ctx)
-    else:
-        power_off_disabled_msg = await ctx.send(f"{ctx.author.mention}, Host power options are disabled.")
-        if DISCORD_DELETE_MESSAGES:
-            await asyncio.sleep(60)
-            await power_off_disabled_msg.delete()
+    delete_command_message(ctx)
+    await ctx.defer()
+    async with live_progress(ctx, "Power on host"):
+        if settings.DISCORD_POWER_OPTIONS:
+            await power_on_host(ctx)
+        else:
+            await notify(ctx, f"{ctx.author.mention}, Host power options are disabled.", 60)
 
-@bot.command(name='poweroff', brief="Power off the Proxmox host.")
+@commands.hybrid_command(name='poweroff', brief="Power off the Proxmox host.")
 async def power_off_command(ctx):
-    if DISCORD_DELETE_MESSAGES:
-        await ctx.message.delete()
+    delete_command_message(ctx)
+    await ctx.defer()
+    async with live_progress(ctx, "Power off host"):
+        if settings.DISCORD_POWER_OPTIONS:
+            await power_off_host(ctx)
+        else:
+            await notify(ctx, f"{ctx.author.mention}, Host power options are disabled.", 60)
+
+class NotAdmin(commands.CheckFailure):
+    pass
+
+def is_admin():
+    async def predicate(ctx):
+        roles = getattr(ctx.author, "roles", [])
+        if ctx.author.id in settings.DISCORD_ADMIN_USER_IDS or any(role.id in settings.DISCORD_ADMIN_ROLE_IDS for role in roles):
+            return True
+        raise NotAdmin()
+    return commands.check(predicate)
+
+async def run_bulk_action(ctx, vm_ids, action, verb, expected_state):
+    # Runs action on every VM, at most settings.PROXMOX_BULK_PARALLELISM at a time, and keeps
+    # a running count in the progress message. Returns the failed operations.
+    semaphore = asyncio.Semaphore(settings.PROXMOX_BULK_PARALLELISM)
+    done = []
+    failed = []
+
+    async def run(vm_id):
+        async with semaphore:
+            operation, _ = vm_operations.submit(vm_id, action)
+            operation = await follow_vm_operation(operation, expected_state)
+        done.append(operation)
+        if not operation.ok:
+            failed.append(operation)
+            await notify(ctx, f"Failed to {verb} VM {vm_id}. {operation.describe_failure()}", 60, failed=True)
+        await ctx.progress.set_status(f"{verb.capitalize()}: {len(done)}/{len(vm_ids)} done, {len(failed)} failed")
+
+    await ctx.progress.set_status(f"{verb.capitalize()}: 0/{len(vm_ids)} done")
+    started = time.monotonic()
+    await asyncio.gather(*(run(vm_id) for vm_id in vm_ids))
+    print(f"Bulk {action} of {len(vm_ids)} VMs finished in {time.monotonic() - started:.1f} seconds, {len(failed)} failed")
+    return failed
+
+async def bulk_vm_statuses(ctx):
+    # Fresh state of every mapped VM, None if Proxmox can't be reached
+    status_cache.invalidate(("vms",))
+    vm_statuses = await get_vm_statuses(all_mapped_vm_ids())
+    if vm_statuses is None:
+        await notify(ctx, "Proxmox server is not responding. It may be offline.", 60, failed=True)
+    return vm_statuses
+
+@commands.hybrid_command(name='startall', brief="Start every mapped VM (admins only).")
+@is_admin()
+async def start_all_command(ctx):
+    delete_command_message(ctx)
+    await ctx.defer()
+    async with live_progress(ctx, "Start all VMs"):
+        await refresh_host_lifecycle()
+        try:
+            with host_lifecycle.pending_start():
+                await start_all_when_ready(ctx)
+        except HostUnavailable as e:
+            await notify(ctx, f"VMs can't be started now, {e}.", 60, failed=True)
+
+async def start_all_when_ready(ctx):
+    response = await check_proxmox_status(ctx, direct_command=True)
+    if response is None:
+        offerpower = await offer_host_power_options(ctx)
+        if offerpower != "powered_on" or not await wait_for_host_ready():
+            return
+    elif response.status_code != 200:
+        await notify(ctx, "Failed to retrieve Proxmox server status.", 60, failed=True)
+        return
+
+    vm_statuses = await bulk_vm_statuses(ctx)
+    if vm_statuses is None:
+        return
+    vm_ids = [vm_id for vm_id, vm_status in vm_statuses.items() if vm_status != 'running']
+    if not vm_ids:
+        await notify(ctx, "Every mapped VM is already running.", 30)
+        return
+    failed = await run_bulk_action(ctx, vm_ids, "start", "start", "running")
+    if not failed:
+        await notify(ctx, f"Started {len(vm_ids)} VMs.", 60)
+
+@commands.hybrid_command(name='stopall', brief="Shut down every mapped VM (admins only).")
+@is_admin()
+async def stop_all_command(ctx):
+    delete_command_message(ctx)
+    await ctx.defer()
+    async with live_progress(ctx, "Stop all VMs"):
+        vm_statuses = await bulk_vm_statuses(ctx)
+        if vm_statuses is None:
+            return
+        vm_ids = [vm_id for vm_id, vm_status in vm_statuses.items() if vm_status == 'running']
+        if not vm_ids:
+            await notify(ctx, "No mapped VM is running.", 30)
+            return
+        failed = await run_bulk_action(ctx, vm_ids, "shutdown", "shut down", "stopped")
+        if not failed:
+            await notify(ctx, f"Shut down {len(vm_ids)} VMs.", 60)
+
+@commands.hybrid_command(name='drain', brief="Shut down every VM on the host, then power it off (admins only).")
+@is_admin()
+async def drain_command(ctx):
+    delete_command_message(ctx)
+    await ctx.defer()
+    async with live_progress(ctx, "Drain and power off"):
+        vm_statuses = await bulk_vm_statuses(ctx)
+        if vm_statuses is None:
+            return
+        # New VM starts are refused from here on, pending ones keep the host on
+        try:
+            host_lifecycle.begin_drain()
+        except HostUnavailable as e:
+            await notify(ctx, f"The host can't be drained now, {e}.", 60, failed=True)
+            return
+        try:
+            await drain_and_power_off(ctx, vm_statuses)
+        finally:
+            host_lifecycle.end_drain()
+
+async def drain_and_power_off(ctx, vm_statuses):
+    # Only VMs on the node being powered off matter
+    vm_ids = [vm_id for vm_id, vm_status in vm_statuses.items()
+              if vm_status == 'running' and vm_index.cached_node(vm_id) in (None, settings.PROXMOX_NODE_NAME)]
+    if vm_ids and await run_bulk_action(ctx, vm_ids, "shutdown", "shut down", "stopped"):
+        await notify(ctx, "Not every VM shut down, the host stays on.", 60, failed=True)
+        return
+
+    # Check again, a VM may have been started outside the bot while draining
+    vm_statuses = await bulk_vm_statuses(ctx)
+    if vm_statuses is None:
+        return
+    still_running = [vm_id for vm_id, vm_status in vm_statuses.items()
+                     if vm_status == 'running' and vm_index.cached_node(vm_id) in (None, settings.PROXMOX_NODE_NAME)]
+    if still_running or vm_operations.pending():
+        await notify(ctx, f"VMs are running again ({', '.join(still_running) or 'pending starts'}), the host stays on.", 60, failed=True)
+        return
+    try:
+        if await soft_power_off_host():
+            await notify(ctx, "All VMs are down, the host is powering off gracefully.", 180)
+        else:
+            await notify(ctx, "All VMs are down, the host is already off.", 60)
+    except Exception as e:
+        await notify(ctx, f"Failed to power off server. Error: {str(e)}", 60, failed=True)
 
-    if DISCORD_POWER_OPTIONS:
-        await power_off_host(ctx)
+@commands.hybrid_command(name='sensors', brief="Show temperatures, fan speeds and power draw of the host.")
+async def sensors_command(ctx):
+    delete_command_message(ctx)
+    await ctx.defer()
+
+    try:
+        readings = await sensor_reader.read_all()
+    except Exception as e:
+        await notify(ctx, f"{ctx.author.mention}, failed to read the host sensors. Error: {str(e)}", 60, failed=True)
+        return
+    if not readings:
+        await notify(ctx, f"{ctx.author.mention}, the BMC reports no readable sensors.", 30)
+        return
+
+    embed = discord.Embed(title="Host sensors", color=discord.Color.blurple())
+    for group, group_members in group_readings(readings).items():
+        embed.add_field(name=group, value="\n".join(reading.describe() for reading in group_members)[:1024],
+                        inline=False)
+    sensorsmsg = await ctx.send(ctx.author.mention, embed=embed)
+    schedule_delete(sensorsmsg, 120)
+
+@commands.hybrid_command(name='prewarmstats', brief="Show how well predictive pre-warming works.")
+async def prewarm_stats_command(ctx):
+    delete_command_message(ctx)
+    await ctx.defer()
+
+    report = await usage_history.prewarm_report()
+    histogram, observed_weeks = await usage_history.demand_histogram(settings.PREWARM_HISTORY_WEEKS)
+    busiest = sorted(histogram.items(), key=lambda item: item[1], reverse=True)[:3]
+    weekdays = ("Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun")
+    busiest_text = ", ".join(f"{weekdays[weekday]} {hour:02d}:00 ({share:.0%})" for (weekday, hour), share in busiest) or "none yet"
+    prewarmstatsmsg = await ctx.send(
+        f"{ctx.author.mention}, pre-warming is {'on' if settings.PREWARM_ENABLED else 'off'}. "
+        f"{report['prewarms']} pre-warm boots, {report['hits']} used ({report['hit_rate']:.0%} hit rate), "
+        f"{report['minutes_saved']:.0f} minutes of boot wait saved. "
+        f"{observed_weeks} weeks of history, busiest hours: {busiest_text}.")
+    schedule_delete(prewarmstatsmsg, 60)
+
+@commands.hybrid_command(name='vmlist', brief="Show the state of every mapped VM.")
+async def vm_list_command(ctx):
+    delete_command_message(ctx)
+    await ctx.defer()
+
+    if snapshot_is_fresh() and watcher.snapshot.proxmox_ready:
+        vm_statuses = watcher.snapshot.vm_states
     else:
-        power_off_disabled_msg = await ctx.send(f"{ctx.author.mention}, Host power options are disabled.")
-        if DISCORD_DELETE_MESSAGES:
-            await asyncio.sleep(60)
-            await power_off_disabled_msg.delete()
+        vm_statuses = await get_vm_statuses(all_mapped_vm_ids())
+    if vm_statuses is None:
+        await notify(ctx, f"{ctx.author.mention}, Proxmox server is not responding. It may be offline.", 60, failed=True)
+        return
 
-bot.run(DISCORD_TOKEN)
+    lines = [f"<@{discord_user_id}> - VM {vm_id} on {vm_index.cached_node(vm_id) or settings.PROXMOX_NODE_NAME}: "
+             f"{vm_statuses.get(vm_id) or 'unknown'}"
+             for discord_user_id in settings.DISCORD_TO_VM_MAPPING for vm_id in user_vm_ids(discord_user_id)]
+    vmlistmsg = await ctx.send(f"{ctx.author.mention}, VM overview:\n" + "\n".join(lines),
+                               allowed_mentions=discord.AllowedMentions.none())
+    schedule_delete(vmlistmsg, 120)
+
+@commands.hybrid_command(name='cachestats', brief="Show how many Proxmox calls the status cache saved.")
+async def cache_stats_command(ctx):
+    delete_command_message(ctx)
+    await ctx.defer()
+
+    stats = status_cache.stats()
+    cachestatsmsg = await ctx.send(f"{ctx.author.mention}, status cache: {stats['hits']} hits, {stats['coalesced']} coalesced, "
+                                   f"{stats['misses']} misses ({stats['api_calls_saved']} Proxmox calls saved, "
+                                   f"{stats['hit_ratio']:.0%} hit ratio).")
+    schedule_delete(cachestatsmsg, 60)
+
+async def reload_config(reason):
+    global config_mtime, ipmi, proxmox
+    try:
+        new_settings = load_config(config_file_path)
+    except (OSError, ValueError) as e:
+        print(f"Config reload ({reason}) failed, keeping the current config: {str(e)}")
+        return False
+
+    previous = vars(settings)
+    current = vars(new_settings)
+    apply_config(new_settings)
+    config_mtime = os.path.getmtime(config_file_path)
+
+    # Connection settings changed: build new clients, they connect lazily on first use
+    if any(previous[name] != current[name] for name in ("PROXMOX_BASE_URL", "PROXMOX_USERNAME", "PROXMOX_REALM",
+                                                           "PROXMOX_TOKEN_NAME", "PROXMOX_TOKEN", "PROXMOX_VERIFY_SSL",
+                                                           "PROXMOX_TIMEOUT")):
+        old_proxmox, proxmox = proxmox, build_proxmox()
+        status_cache.clear()
+        await old_proxmox.close()
+    if any(previous[name] != current[name] for name in ("IPMI_HOST", "IPMI_PORT", "IPMI_USERNAME", "IPMI_PASSWORD",
+                                                           "IPMI_TIMEOUT", "IPMI_STATUS_TTL", "IPMI_SENSOR_CONCURRENCY",
+                                                           "IPMI_TRANSPORT", "IPMI_KEEP_ALIVE_INTERVAL")):
+        old_ipmi, ipmi = ipmi, build_ipmi()
+        old_ipmi.close()
+        sensor_reader.ipmi = ipmi
+    configure_services()
+
+    changed = sorted(name for name in current if previous.get(name) != current[name])
+    print(f"Config reloaded ({reason}), changed: {', '.join(changed) or 'nothing'}")
+    needs_restart = [name for name in RESTART_ONLY_SETTINGS if name in changed]
+    if needs_restart:
+        print(f"Restart the bot to apply: {', '.join(needs_restart)}")
+    return True
+
+@tasks.loop(seconds=10)
+async def config_file_watch():
+    try:
+        mtime = os.path.getmtime(config_file_path)
+    except OSError:
+        return
+    if mtime != config_mtime:
+        await reload_config("file changed")
+
+def configure_services():
+    # Pushes the current settings into the long-lived services and starts or stops the loops they enable
+    if settings.DISCORD_CONFIG_RELOAD_INTERVAL and config_file_watch.is_running():
+        config_file_watch.change_interval(seconds=settings.DISCORD_CONFIG_RELOAD_INTERVAL)
+    elif settings.DISCORD_CONFIG_RELOAD_INTERVAL:
+        config_file_watch.change_interval(seconds=settings.DISCORD_CONFIG_RELOAD_INTERVAL)
+        config_file_watch.start()
+    elif config_file_watch.is_running():
+        # May be the running iteration itself, let it finish
+        config_file_watch.stop()
+    if settings.DISCORD_REPORT_INTERVAL and resource_report.is_running():
+        resource_report.change_interval(minutes=settings.DISCORD_REPORT_INTERVAL)
+    elif settings.DISCORD_REPORT_INTERVAL and bot.is_ready():
+        resource_report.change_interval(minutes=settings.DISCORD_REPORT_INTERVAL)
+        resource_report.start()
+    elif not settings.DISCORD_REPORT_INTERVAL and resource_report.is_running():
+        resource_report.cancel()
+    if settings.DISCORD_CLEAR_CHANNEL and bot.is_ready() and not clear_channel.is_running():
+        clear_channel.start()
+    elif not settings.DISCORD_CLEAR_CHANNEL and clear_channel.is_running():
+        clear_channel.cancel()
+    if settings.WATCHER_ENABLED and bot.is_ready():
+        watcher.start()
+    elif not settings.WATCHER_ENABLED:
+        watcher.stop()
+    vm_index.ttl = settings.PROXMOX_VM_INDEX_TTL
+    task_tracker.min_interval = settings.PROXMOX_TASK_POLL_MIN
+    task_tracker.max_interval = settings.PROXMOX_TASK_POLL_MAX
+    task_tracker.timeout = settings.PROXMOX_TASK_TIMEOUT
+    watcher.fast_interval = settings.WATCHER_FAST_INTERVAL
+    watcher.slow_interval = settings.WATCHER_SLOW_INTERVAL
+    watcher.max_age = settings.WATCHER_MAX_AGE
+    boot_history.path = settings.PROXMOX_BOOT_HISTORY_FILE
+    proxmox.breaker.failure_threshold = settings.PROXMOX_BREAKER_THRESHOLD
+    proxmox.breaker.reset_timeout = settings.PROXMOX_BREAKER_RESET
+    proxmox.breaker.probe_interval = settings.PROXMOX_BREAKER_PROBE_INTERVAL
+    sensor_reader.cache.path = settings.IPMI_SDR_CACHE_FILE
+    sensor_reader.concurrency = settings.IPMI_SENSOR_CONCURRENCY
+    if settings.IPMI_TELEMETRY_INTERVAL and sensor_telemetry.is_running():
+        sensor_telemetry.change_interval(seconds=settings.IPMI_TELEMETRY_INTERVAL)
+    elif settings.IPMI_TELEMETRY_INTERVAL and bot.is_ready():
+        sensor_telemetry.change_interval(seconds=settings.IPMI_TELEMETRY_INTERVAL)
+        sensor_telemetry.start()
+    elif not settings.IPMI_TELEMETRY_INTERVAL and sensor_telemetry.is_running():
+        sensor_telemetry.cancel()
+    prewarm_planner.min_probability = settings.PREWARM_MIN_PROBABILITY
+    prewarm_planner.min_weeks = settings.PREWARM_MIN_WEEKS
+    if settings.PREWARM_ENABLED and prewarm_check.is_running():
+        prewarm_check.change_interval(seconds=settings.PREWARM_CHECK_INTERVAL)
+    elif settings.PREWARM_ENABLED and bot.is_ready():
+        usage_history.start()
+        prewarm_check.change_interval(seconds=settings.PREWARM_CHECK_INTERVAL)
+        prewarm_check.start()
+    elif not settings.PREWARM_ENABLED and prewarm_check.is_running():
+        prewarm_check.cancel()
+    idle_detector.grace_period = settings.IDLE_GRACE_PERIOD
+    idle_detector.cpu_threshold = settings.IDLE_CPU_THRESHOLD
+    idle_detector.net_threshold = settings.IDLE_NET_THRESHOLD
+    idle_detector.time_constant = settings.IDLE_SMOOTHING
+    if settings.IDLE_ENABLED and idle_check.is_running():
+        idle_check.change_interval(seconds=settings.IDLE_CHECK_INTERVAL)
+    elif settings.IDLE_ENABLED and bot.is_ready():
+        idle_check.change_interval(seconds=settings.IDLE_CHECK_INTERVAL)
+        idle_check.start()
+    elif not settings.IDLE_ENABLED and idle_check.is_running():
+        idle_check.cancel()
+
+async def setup_hook():
+    # Runs once before connecting to the gateway
+    if settings.DISCORD_CONFIG_RELOAD_INTERVAL:
+        config_file_watch.change_interval(seconds=settings.DISCORD_CONFIG_RELOAD_INTERVAL)
+        config_file_watch.start()
+    try:
+        asyncio.get_running_loop().add_signal_handler(
+            signal.SIGHUP, lambda: asyncio.ensure_future(reload_config("SIGHUP")))
+    except (NotImplementedError, AttributeError, RuntimeError):
+        pass  # No SIGHUP on this platform, the file watch still works
+
+    if settings.METRICS_ENABLED:
+        global metrics_runner
+        loop_lag_monitor.interval = settings.METRICS_LAG_INTERVAL
+        loop_lag_monitor.start()
+        try:
+            metrics_runner = await start_metrics_server(metrics, settings.METRICS_HOST, settings.METRICS_PORT)
+        except OSError as e:
+            print(f"Failed to start the metrics endpoint on {settings.METRICS_HOST}:{settings.METRICS_PORT}: {str(e)}")
+
+BOT_COMMANDS = (
+    server_status_command,
+    start_vm_command,
+    stop_vm_command,
+    power_on_command,
+    power_off_command,
+    vm_list_command,
+    cache_stats_command,
+    start_all_command,
+    stop_all_command,
+    drain_command,
+    sensors_command,
+    prewarm_stats_command,
+)
+
+def create_bot(path):
+    # Builds the bot and its services without touching the network. Discord,
+    # Proxmox and the BMC are only contacted once the bot runs.
+    global bot, config_file_path, config_mtime, ipmi, proxmox, vm_index, watcher, boot_history, task_tracker, vm_operations
+    global idle_detector, sensor_reader, usage_history, host_lifecycle
+    config_file_path = path
+    apply_config(load_config(path))
+    config_mtime = os.path.getmtime(path)
+
+    ipmi = build_ipmi()
+    proxmox = build_proxmox()
+
+    # Which node each VM lives on, so VMs on every cluster node can be managed
+    vm_index = VmNodeIndex(fetch_cluster_vms, ttl=settings.PROXMOX_VM_INDEX_TTL)
+
+    # Background poller, commands answer from its snapshot while it is fresh
+    watcher = StateWatcher(read_host_power, read_node_status, read_mapped_vm_statuses, notify_state_change,
+                           fast_interval=settings.WATCHER_FAST_INTERVAL, slow_interval=settings.WATCHER_SLOW_INTERVAL,
+                           max_age=settings.WATCHER_MAX_AGE)
+
+    # Measured boot durations, used to tune startup_time
+    boot_history = BootHistory(settings.PROXMOX_BOOT_HISTORY_FILE)
+
+    # Host power state shared by every command: one boot at a time, joined by everyone who needs it
+    host_lifecycle = HostLifecycle(send_host_power_on, poll_until_host_ready)
+
+    # Power actions run one at a time per VM, repeated requests join the pending one,
+    # and every returned task (UPID) is followed to completion by a single poller
+    task_tracker = TaskTracker(fetch_task_status, min_interval=settings.PROXMOX_TASK_POLL_MIN,
+                               max_interval=settings.PROXMOX_TASK_POLL_MAX, timeout=settings.PROXMOX_TASK_TIMEOUT)
+    vm_operations = VmOperationQueue(send_vm_action, task_tracker)
+
+    # Tracks how long the host has had nothing to do, for the idle power off
+    idle_detector = IdleDetector(grace_period=settings.IDLE_GRACE_PERIOD, cpu_threshold=settings.IDLE_CPU_THRESHOLD,
+                                 net_threshold=settings.IDLE_NET_THRESHOLD, time_constant=settings.IDLE_SMOOTHING)
+
+    # BMC sensors, the SDR repository is cached on disk
+    sensor_reader = SensorReader(ipmi, settings.IPMI_SDR_CACHE_FILE, concurrency=settings.IPMI_SENSOR_CONCURRENCY)
+
+    # Command history for predictive pre-warming, opened on first use
+    usage_history = UsageHistory(settings.PREWARM_HISTORY_FILE)
+
+    # Only the intents the bot acts on: guild/channel info and the messages in its channel.
+    # Message content is needed for the ! prefix commands.
+    intents = discord.Intents.none()
+    intents.guilds = True
+    intents.guild_messages = True
+    intents.message_content = True
+
+    # Initialize the bot with the intents parameter, without member caching and with a bounded message cache
+    bot = commands.Bot(command_prefix='!', intents=intents,
+                       member_cache_flags=discord.MemberCacheFlags.none(),
+                       max_messages=settings.DISCORD_MAX_MESSAGES,
+                       chunk_guilds_at_startup=False)
+    bot.setup_hook = setup_hook
+    bot.event(on_ready)
+    bot.event(on_message)
+    bot.event(on_command_error)
+    bot.add_listener(count_gateway_event, 'on_socket_event_type')
+    bot.add_listener(route_interaction, 'on_interaction')
+    bot.add_listener(track_bot_messages, 'on_message')
+    bot.add_check(only_in_bot_channel)
+    bot.before_invoke(mark_command_start)
+    bot.add_listener(count_command_completion, 'on_command_completion')
+    instrument_discord_http(bot.http)
+    for command in BOT_COMMANDS:
+        bot.add_command(command)
+
+    print(f'Bot created in {time.monotonic() - MODULE_LOADED_AT:.2f} seconds')
+    return bot
+
+def main():
+    # Create an ArgumentParser instance
+    parser = argparse.ArgumentParser(description='Discord bot for Proxmox VM power operations.')
+
+    # Add the --config-file argument
+    parser.add_argument('--config-file', dest='config_file', default='config.json',
+                        help='Path to the configuration file')
+
+    # Parse the command-line arguments
+    args = parser.parse_args()
+
+    create_bot(args.config_file).run(settings.DISCORD_TOKEN)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,109 @@
+import asyncio
+import heapq
+import time
+import discord
+
+
+class MessageScheduler:
+    # Deletes temporary messages from one background task instead of one sleeping
+    # coroutine per message. Messages that are due together go out in a single
+    # bulk delete (up to 100 per call).
+    BATCH_SIZE = 100
+    MAX_TRACKED = 5000  # per channel, the oldest are forgotten first
+
+    def __init__(self):
+        self._heap = []  # (delete_at, message_id, channel_id)
+        self._channels = {}  # channel_id -> channel, to issue the deletes
+        self._tracked = {}  # channel_id -> {message_id: None} the bot knows it may clean up, oldest first
+        self._wakeup = asyncio.Event()
+        self._task = None
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    def pending(self):
+        return len(self._heap)
+
+    def track(self, message):
+        self._channels[message.channel.id] = message.channel
+        tracked = self._tracked.setdefault(message.channel.id, {})
+        tracked[message.id] = None
+        if len(tracked) > self.MAX_TRACKED:
+            del tracked[next(iter(tracked))]
+
+    def schedule(self, message, delay):
+        self.track(message)
+        heapq.heappush(self._heap, (time.monotonic() + delay, message.id, message.channel.id))
+        self._wakeup.set()
+
+    async def _run(self):
+        while True:
+            if not self._heap:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                continue
+
+            delay = self._heap[0][0] - time.monotonic()
+            if delay > 0:
+                # Sleep until the next message is due or something earlier gets scheduled
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), delay)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            due = {}
+            now = time.monotonic()
+            while self._heap and self._heap[0][0] <= now:
+                _, message_id, channel_id = heapq.heappop(self._heap)
+                due.setdefault(channel_id, []).append(message_id)
+
+            for channel_id, message_ids in due.items():
+                try:
+                    await self.delete(channel_id, message_ids)
+                except Exception as e:
+                    print(f"Error while deleting messages: {str(e)}")
+
+    async def delete(self, channel_id, message_ids):
+        channel = self._channels.get(channel_id)
+        if channel is None:
+            return 0
+        deleted = 0
+        for start in range(0, len(message_ids), self.BATCH_SIZE):
+            batch = message_ids[start:start + self.BATCH_SIZE]
+            try:
+                await channel.delete_messages([discord.Object(id=message_id) for message_id in batch])
+                deleted += len(batch)
+            except discord.NotFound:
+                pass
+            except discord.HTTPException:
+                # Bulk delete needs Manage Messages and refuses messages older than 14 days,
+                # fall back to deleting them one by one
+                for message_id in batch:
+                    try:
+                        await channel.get_partial_message(message_id).delete()
+                        deleted += 1
+                    except discord.NotFound:
+                        pass
+                    except discord.HTTPException as e:
+                        print(f"Failed to delete message {message_id}: {e}")
+            tracked = self._tracked.get(channel_id, {})
+            for message_id in batch:
+                tracked.pop(message_id, None)
+        return deleted
+
+    async def purge_tracked(self, channel):
+        # Deletes every message the bot has tracked in the channel, no history scan needed
+        self._channels[channel.id] = channel
+        tracked = self._tracked.get(channel.id, {})
+        message_ids = sorted(tracked)
+        self._heap = [entry for entry in self._heap if entry[2] != channel.id or entry[1] not in tracked]
+        heapq.heapify(self._heap)
+        return await self.delete(channel.id, message_ids)
@@ -0,0 +1,172 @@
+import asyncio
+import math
+import time
+from aiohttp import web
+
+# Seconds, from a fast cached answer up to a Proxmox task or a BMC timeout
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+
+def _format_labels(label_names, label_values, extra=()):
+    pairs = list(zip(label_names, label_values)) + list(extra)
+    if not pairs:
+        return ""
+    escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, value in pairs)
+    return "{" + ",".join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + "}"
+
+
+def _format_value(value):
+    if value == math.inf:
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name, help_text, labels=()):
+        self.name = name
+        self.help_text = help_text
+        self.labels = tuple(labels)
+        self._values = {}  # label values -> count
+
+    def inc(self, amount=1, **labels):
+        key = tuple(str(labels.get(name, "")) for name in self.labels)
+        self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self):
+        for key, value in self._values.items():
+            yield self.name, _format_labels(self.labels, key), value
+
+
+class Gauge:
+    kind = "gauge"
+
+    def __init__(self, name, help_text, labels=(), read=None):
+        self.name = name
+        self.help_text = help_text
+        self.labels = tuple(labels)
+        self.read = read  # optional callable, evaluated on every scrape
+        self._values = {}
+
+    def set(self, value, **labels):
+        key = tuple(str(labels.get(name, "")) for name in self.labels)
+        self._values[key] = value
+
+    def samples(self):
+        if self.read is not None:
+            try:
+                yield self.name, "", self.read()
+            except Exception as e:
+                print(f"Failed to read gauge {self.name}: {str(e)}")
+            return
+        for key, value in self._values.items():
+            yield self.name, _format_labels(self.labels, key), value
+
+
+class Histogram:
+    # Fixed buckets per label set, so memory stays constant however many
+    # observations come in
+    kind = "histogram"
+
+    def __init__(self, name, help_text, labels=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.labels = tuple(labels)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+        self._values = {}  # label values -> [bucket counts, sum, count]
+
+    def observe(self, value, **labels):
+        key = tuple(str(labels.get(name, "")) for name in self.labels)
+        entry = self._values.get(key)
+        if entry is None:
+            entry = self._values[key] = [[0] * len(self.buckets), 0.0, 0]
+        for index, bound in enumerate(self.buckets):
+            if value <= bound:
+                entry[0][index] += 1
+                break
+        entry[1] += value
+        entry[2] += 1
+
+    def samples(self):
+        for key, (counts, total, count) in self._values.items():
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                yield f"{self.name}_bucket", _format_labels(self.labels, key, [("le", _format_value(bound))]), cumulative
+            yield f"{self.name}_sum", _format_labels(self.labels, key), total
+            yield f"{self.name}_count", _format_labels(self.labels, key), count
+
+
+class MetricsRegistry:
+    def __init__(self, prefix=""):
+        self.prefix = prefix
+        self._metrics = []
+
+    def _register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self, name, help_text, labels=()):
+        return self._register(Counter(self.prefix + name, help_text, labels))
+
+    def gauge(self, name, help_text, labels=(), read=None):
+        return self._register(Gauge(self.prefix + name, help_text, labels, read))
+
+    def histogram(self, name, help_text, labels=(), buckets=DEFAULT_BUCKETS):
+        return self._register(Histogram(self.prefix + name, help_text, labels, buckets))
+
+    def render(self):
+        # Prometheus text exposition format
+        lines = []
+        for metric in self._metrics:
+            lines.append(f"# HELP {metric.name} {metric.help_text}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            for name, labels, value in metric.samples():
+                lines.append(f"{name}{labels} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+class LoopLagMonitor:
+    # Sleeps for a fixed interval and measures how late it wakes up. Anything
+    # that blocks the event loop shows up directly as lag.
+    def __init__(self, gauge, histogram=None, interval=0.5):
+        self.gauge = gauge
+        self.histogram = histogram
+        self.interval = interval
+        self.max_lag = 0.0
+        self._task = None
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    async def _run(self):
+        while True:
+            expected = time.monotonic() + self.interval
+            await asyncio.sleep(self.interval)
+            lag = max(time.monotonic() - expected, 0.0)
+            self.max_lag = max(self.max_lag, lag)
+            self.gauge.set(lag)
+            if self.histogram is not None:
+                self.histogram.observe(lag)
+
+
+async def start_metrics_server(registry, host, port):
+    # Serves GET /metrics, returns the runner so the caller can clean it up
+    async def handle_metrics(request):
+        return web.Response(text=registry.render(), content_type="text/plain", charset="utf-8",
+                            headers={"X-Content-Type-Options": "nosniff"})
+
+    app = web.Application()
+    app.router.add_get("/metrics", handle_metrics)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    print(f"Metrics available on http://{host}:{port}/metrics")
+    return runner
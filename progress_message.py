@@ -0,0 +1,119 @@
+import asyncio
+import time
+import discord
+
+COLOR_RUNNING = discord.Color.blurple()
+COLOR_OK = discord.Color.green()
+COLOR_FAILED = discord.Color.red()
+
+
+class ProgressMessage:
+    # One embed per command that is edited in place as the command moves along.
+    # The first update is sent right away; later ones are coalesced so the
+    # message is edited at most once every min_interval seconds, with the latest
+    # state. Prompts put their buttons on the same message.
+    MAX_LINES = 15
+
+    def __init__(self, send, title, content=None, min_interval=1.5):
+        self.send = send  # ctx.send
+        self.title = title
+        self.content = content
+        self.min_interval = min_interval
+        self.status = None  # summary shown above the lines, e.g. a counter
+        self.lines = []
+        self.failed = False
+        self.finished = False
+        self.delete_after = 30
+        self.message = None
+        self.sends = 0
+        self.edits = 0
+        self._prompts = {}  # key -> (text, buttons), in the order they were opened
+        self._last_edit = 0.0
+        self._dirty = False
+        self._flush_task = None
+        self._lock = asyncio.Lock()
+
+    def _render(self):
+        color = COLOR_FAILED if self.failed else COLOR_OK if self.finished else COLOR_RUNNING
+        lines = ([self.status] if self.status else []) + self.lines[-self.MAX_LINES:] \
+            + [text for text, _ in self._prompts.values()]
+        embed = discord.Embed(title=self.title, description="\n".join(lines) or "Working...", color=color)
+        view = None
+        if self._prompts:
+            view = discord.ui.View(timeout=None)
+            for _, buttons in self._prompts.values():
+                for button in buttons:
+                    view.add_item(button)
+            # Clicks are routed by the InteractionDispatcher, not by the view
+            view.stop()
+        return embed, view
+
+    async def flush(self):
+        async with self._lock:
+            self._dirty = False
+            embed, view = self._render()
+            if self.message is None:
+                kwargs = {"embed": embed}
+                if view is not None:
+                    kwargs["view"] = view
+                self.message = await self.send(self.content, **kwargs)
+                self.sends += 1
+            else:
+                try:
+                    await self.message.edit(embed=embed, view=view)
+                    self.edits += 1
+                except discord.NotFound:
+                    # Deleted under us, start a new one
+                    self.message = await self.send(self.content, embed=embed, view=view)
+                    self.sends += 1
+            self._last_edit = time.monotonic()
+
+    async def _flush_later(self, delay):
+        await asyncio.sleep(delay)
+        if self._dirty:
+            try:
+                await self.flush()
+            except discord.HTTPException as e:
+                print(f"Failed to update progress message: {e}")
+
+    async def _changed(self, immediate=False):
+        self._dirty = True
+        wait = self.min_interval - (time.monotonic() - self._last_edit)
+        if self.message is None or immediate or wait <= 0:
+            if self._flush_task is not None and not self._flush_task.done():
+                self._flush_task.cancel()
+            await self.flush()
+        elif self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.ensure_future(self._flush_later(wait))
+
+    async def update(self, line, failed=False, delete_after=None):
+        self.lines.append(line)
+        self.failed = self.failed or failed
+        if delete_after is not None:
+            self.delete_after = max(self.delete_after, delete_after)
+        await self._changed()
+
+    async def set_status(self, status, failed=False):
+        self.status = status
+        self.failed = self.failed or failed
+        await self._changed()
+
+    async def add_prompt(self, key, text, view):
+        # Used as the send callable of InteractionDispatcher.ask, buttons must show up right away
+        self._prompts[key] = (text, list(view.children))
+        await self._changed(immediate=True)
+        return self.message
+
+    async def remove_prompt(self, key):
+        if self._prompts.pop(key, None) is not None:
+            await self._changed(immediate=True)
+
+    async def finish(self):
+        # Final state goes out immediately, returns the message or None if nothing was ever shown
+        self.finished = True
+        if self._flush_task is not None and not self._flush_task.done():
+            self._flush_task.cancel()
+        if self.message is None and not self.lines and not self.status:
+            return None
+        await self.flush()
+        return self.message
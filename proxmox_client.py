@@ -0,0 +1,144 @@
+import asyncio
+import json
+import re
+import time
+import aiohttp
+
+# Node names, vmids and UPIDs are replaced so every endpoint keeps one label
+_PATH_PARAMETERS = (
+    (re.compile(r"/nodes/[^/]+"), "/nodes/{node}"),
+    (re.compile(r"/qemu/\d+"), "/qemu/{vmid}"),
+    (re.compile(r"/tasks/[^/]+"), "/tasks/{upid}"),
+)
+
+
+def path_template(path):
+    for pattern, replacement in _PATH_PARAMETERS:
+        path = pattern.sub(replacement, path)
+    return path
+
+
+class ProxmoxConnectionError(Exception):
+    # Raised when the Proxmox API can't be reached (refused, DNS, timeout...)
+    pass
+
+
+class CircuitOpenError(ProxmoxConnectionError):
+    # Raised without touching the network while the circuit breaker is open
+    pass
+
+
+class ProxmoxResponse:
+    # Small stand-in for the requests.Response objects the bot used to pass around
+    def __init__(self, status_code, body, text):
+        self.status_code = status_code
+        self.body = body
+        self.text = text
+
+    def json(self):
+        return self.body
+
+    @property
+    def data(self):
+        return self.body.get("data") if isinstance(self.body, dict) else None
+
+
+class ProxmoxClient:
+    def __init__(self, base_url, username, realm, token_name, token,
+                 verify_ssl=False, timeout=5, pool_size=10, keepalive_timeout=60, on_request=None,
+                 breaker=None):
+        self.base_url = base_url.rstrip('/')
+        # The auth header never changes, so build it once instead of on every call
+        self.headers = {"Authorization": f"PVEAPIToken={username}@{realm}!{token_name}={token}"}
+        self.verify_ssl = verify_ssl
+        self.timeout = timeout
+        self.pool_size = pool_size
+        self.keepalive_timeout = keepalive_timeout
+        self.on_request = on_request  # optional (method, path_template, status, seconds) callback
+        self.breaker = breaker  # optional CircuitBreaker, trips on connection failures only
+        self._session = None
+
+    def _get_session(self):
+        # Created lazily so it binds to the running event loop, then reused so
+        # every call goes over an already open keep-alive connection.
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=self.pool_size,
+                ssl=None if self.verify_ssl else False,
+                keepalive_timeout=self.keepalive_timeout,
+            )
+            self._session = aiohttp.ClientSession(
+                headers=self.headers,
+                connector=connector,
+                timeout=aiohttp.ClientTimeout(total=self.timeout),
+            )
+        return self._session
+
+    async def request(self, method, path, timeout=None, **kwargs):
+        if self.breaker is not None and not self.breaker.allow():
+            raise CircuitOpenError(self.breaker.describe())
+        session = self._get_session()
+        if timeout is not None:
+            kwargs["timeout"] = aiohttp.ClientTimeout(total=timeout)
+
+        started = time.monotonic()
+        status_code = "error"
+        reachable = None  # None: cancelled or failed some other way, says nothing about the API
+        failure = None
+        try:
+            async with session.request(method, f"{self.base_url}{path}", **kwargs) as response:
+                text = await response.text()
+                status_code = response.status
+                # Any HTTP answer, even an error status, means the API is reachable
+                reachable = True
+        except asyncio.TimeoutError as e:
+            status_code = "timeout"
+            reachable = False
+            failure = "connection timed out"
+            raise ProxmoxConnectionError("Connection timed out.") from e
+        except aiohttp.ClientConnectionError as e:
+            reachable = False
+            failure = str(e) or type(e).__name__
+            raise ProxmoxConnectionError(str(e) or type(e).__name__) from e
+        finally:
+            if self.on_request is not None:
+                self.on_request(method, path_template(path), status_code, time.monotonic() - started)
+            if self.breaker is not None:
+                if reachable:
+                    self.breaker.record_success()
+                elif reachable is False:
+                    self.breaker.record_failure(failure)
+                else:
+                    self.breaker.release()
+
+        try:
+            body = json.loads(text) if text else {}
+        except ValueError:
+            body = {}
+        return ProxmoxResponse(status_code, body, text)
+
+    async def get_node_status(self, node, timeout=None):
+        return await self.request("GET", f"/nodes/{node}/status", timeout=timeout)
+
+    async def get_node_rrddata(self, node, timeframe="hour", cf="AVERAGE", timeout=None):
+        # One call returns every sample of the timeframe (about 70 for an hour)
+        return await self.request("GET", f"/nodes/{node}/rrddata", params={"timeframe": timeframe, "cf": cf},
+                                  timeout=timeout)
+
+    async def get_vm_status(self, node, vm_id, timeout=None):
+        return await self.request("GET", f"/nodes/{node}/qemu/{vm_id}/status/current", timeout=timeout)
+
+    async def get_cluster_resources(self, resource_type="vm", timeout=None):
+        return await self.request("GET", "/cluster/resources", params={"type": resource_type}, timeout=timeout)
+
+    async def vm_action(self, node, vm_id, action, timeout=None):
+        # action is one of Proxmox's status endpoints: start, shutdown, stop, reboot...
+        return await self.request("POST", f"/nodes/{node}/qemu/{vm_id}/status/{action}", timeout=timeout)
+
+    async def get_task_status(self, node, upid, timeout=None):
+        return await self.request("GET", f"/nodes/{node}/tasks/{upid}/status", timeout=timeout)
+
+    async def close(self):
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
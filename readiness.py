@@ -0,0 +1,81 @@
+import asyncio
+import json
+import os
+import random
+import time
+
+
+def backoff_delays(initial, maximum, jitter):
+    # Exponential backoff with +/- jitter so concurrent waiters don't poll in lockstep
+    delay = initial
+    while True:
+        yield max(0.0, delay * random.uniform(1 - jitter, 1 + jitter))
+        delay = min(maximum, delay * 2)
+
+
+async def wait_for_node_ready(read_host_power, read_node_ready, deadline,
+                              initial_delay=2, max_delay=15, jitter=0.2):
+    # Waits for the chassis to report power on, then for the Proxmox node to answer.
+    # Returns the seconds it took, or None if the deadline passed first.
+    started = time.monotonic()
+    stop_at = started + deadline
+
+    async def poll(check):
+        delays = backoff_delays(initial_delay, max_delay, jitter)
+        while True:
+            if await check():
+                return True
+            remaining = stop_at - time.monotonic()
+            if remaining <= 0:
+                return False
+            await asyncio.sleep(min(next(delays), remaining))
+
+    async def host_powered():
+        # None means the BMC couldn't be read, don't let that block the Proxmox check
+        return await read_host_power() is not False
+
+    async def node_ready():
+        return await read_node_ready() is not None
+
+    if await poll(host_powered) and await poll(node_ready):
+        return time.monotonic() - started
+    return None
+
+
+class BootHistory:
+    # Measured power-on to Proxmox-ready durations, kept on disk so startup_time
+    # can be tuned from real boots.
+    def __init__(self, path, keep=50):
+        self.path = path
+        self.keep = keep
+        self.durations = []
+        if path and os.path.exists(path):
+            try:
+                with open(path, 'r') as history_file:
+                    self.durations = json.load(history_file).get("durations", [])[-keep:]
+            except (OSError, ValueError) as e:
+                print(f"Failed to read boot history from {path}: {str(e)}")
+
+    def record(self, seconds):
+        self.durations = (self.durations + [round(seconds, 1)])[-self.keep:]
+        if not self.path:
+            return
+        try:
+            with open(self.path, 'w') as history_file:
+                json.dump({"durations": self.durations, "summary": self.summary()}, history_file, indent=4)
+        except OSError as e:
+            print(f"Failed to write boot history to {self.path}: {str(e)}")
+
+    def summary(self):
+        if not self.durations:
+            return {}
+        ordered = sorted(self.durations)
+        return {
+            "boots": len(ordered),
+            "median": ordered[len(ordered) // 2],
+            "p90": ordered[min(len(ordered) - 1, int(len(ordered) * 0.9))],
+            "max": ordered[-1],
+        }
+
+    def median(self):
+        return self.summary().get("median")
@@ -0,0 +1,44 @@
+import resource
+import sys
+import time
+
+
+def current_rss_mb():
+    # Resident set size of this process in MiB
+    try:
+        with open('/proc/self/status', 'r') as status_file:
+            for line in status_file:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    # No procfs (macOS, ...): fall back to the peak RSS, reported in bytes on macOS and KiB elsewhere
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+class EventRateCounter:
+    # Counts gateway events so the bot can report how many it receives per second
+    def __init__(self):
+        self.total = 0
+        self.by_type = {}
+        self._window_start = time.monotonic()
+        self._window_count = 0
+
+    def record(self, event_type):
+        self.total += 1
+        self._window_count += 1
+        self.by_type[event_type] = self.by_type.get(event_type, 0) + 1
+
+    def rate(self, reset=True):
+        # Events per second since the last reset
+        now = time.monotonic()
+        elapsed = max(now - self._window_start, 1e-9)
+        rate = self._window_count / elapsed
+        if reset:
+            self._window_start = now
+            self._window_count = 0
+        return rate
+
+    def top(self, count=5):
+        return sorted(self.by_type.items(), key=lambda item: item[1], reverse=True)[:count]
@@ -0,0 +1,134 @@
+import asyncio
+import json
+import os
+import pyipmi.sdr
+
+# IPMI base unit codes we display, anything else is shown without a unit
+UNITS = {1: "°C", 2: "°F", 4: "V", 5: "A", 6: "W", 18: "RPM"}
+
+# Analog data format of a full sensor record whose reading is not a number
+NO_ANALOG_READING = 3
+
+# IPMI sensor type codes, used to group the readings
+SENSOR_GROUPS = {1: "Temperature", 2: "Voltage", 3: "Current", 4: "Fan", 8: "Power"}
+
+
+class SensorReading:
+    def __init__(self, name, group, value, unit):
+        self.name = name
+        self.group = group
+        self.value = value
+        self.unit = unit
+
+    def describe(self):
+        if self.value is None:
+            return f"{self.name}: n/a"
+        return f"{self.name}: {self.value:.1f} {self.unit}".rstrip()
+
+
+class SdrCache:
+    # The SDR repository as raw records on disk. It is only valid while the
+    # BMC reports the same last addition time and record count it was read with.
+    def __init__(self, path):
+        self.path = path
+
+    def load(self, host, stamp):
+        if not self.path:
+            return None
+        try:
+            with open(self.path, 'r') as cache_file:
+                cached = json.load(cache_file)
+        except (OSError, ValueError):
+            return None
+        if cached.get("host") != host or cached.get("stamp") != list(stamp):
+            return None
+        try:
+            return [bytes.fromhex(record) for record in cached.get("records", [])]
+        except ValueError:
+            return None
+
+    def save(self, host, stamp, records):
+        if not self.path:
+            return
+        try:
+            temporary_path = f"{self.path}.tmp"
+            with open(temporary_path, 'w') as cache_file:
+                json.dump({"host": host, "stamp": list(stamp), "records": [record.hex() for record in records]}, cache_file)
+            os.replace(temporary_path, self.path)
+        except OSError as e:
+            print(f"Failed to write SDR cache to {self.path}: {str(e)}")
+
+
+class SensorReader:
+    # Reads every analog sensor of the BMC. The SDR repository (sensor names,
+    # numbers and conversion factors) is read once and cached on disk; after
+    # that only the readings are requested, several at a time.
+    def __init__(self, ipmi, cache_path, concurrency=4):
+        self.ipmi = ipmi
+        self.cache = SdrCache(cache_path)
+        self.concurrency = concurrency
+        self._records = None
+        self._stamp = None
+        self._lock = asyncio.Lock()
+
+    async def _repository_stamp(self):
+        info = await self.ipmi.call('get_sdr_repository_info')
+        # pyipmi doesn't decode the last erase time, the record count stands in for it
+        return getattr(info, "most_recent_addition", None), getattr(info, "record_count", None)
+
+    async def records(self):
+        # Sensor records, re-read only when the repository changed
+        async with self._lock:
+            stamp = await self._repository_stamp()
+            if self._records is not None and stamp == self._stamp:
+                return self._records
+
+            raw_records = self.cache.load(self.ipmi.host, stamp)
+            if raw_records is None:
+                print(f"Reading the SDR repository of {self.ipmi.host}, this takes a few seconds")
+                entries = await self.ipmi.call('get_repository_sdr_list', timeout=max(self.ipmi.timeout, 60))
+                raw_records = [bytes(entry.data) for entry in entries]
+                self.cache.save(self.ipmi.host, stamp, raw_records)
+
+            records = []
+            for raw_record in raw_records:
+                try:
+                    record = pyipmi.sdr.SdrCommon.from_data(raw_record)
+                except Exception as e:
+                    print(f"Skipping unreadable SDR record: {str(e)}")
+                    continue
+                # Only full sensor records carry the factors to convert a reading
+                if (record.type == pyipmi.sdr.SDR_TYPE_FULL_SENSOR_RECORD
+                        and getattr(record, "analog_data_format", None) != NO_ANALOG_READING):
+                    records.append(record)
+            self._records = records
+            self._stamp = stamp
+            return records
+
+    async def _read(self, semaphore, record):
+        async with semaphore:
+            try:
+                raw, _ = await self.ipmi.read('get_sensor_reading', record.number, getattr(record, "owner_lun", 0))
+                # Non-linear conversions can fail on some raw values (log of 0, 1/0)
+                value = record.convert_sensor_raw_to_value(raw) if raw is not None else None
+            except Exception as e:
+                print(f"Failed to read sensor {record.device_id_string}: {str(e)}")
+                value = None
+        return SensorReading(record.device_id_string.strip() if isinstance(record.device_id_string, str)
+                             else str(record.device_id_string),
+                             SENSOR_GROUPS.get(getattr(record, "sensor_type_code", None), "Other"),
+                             value, UNITS.get(getattr(record, "units_2", None), ""))
+
+    async def read_all(self):
+        records = await self.records()
+        semaphore = asyncio.Semaphore(self.concurrency)
+        return await asyncio.gather(*(self._read(semaphore, record) for record in records))
+
+
+def group_readings(readings):
+    # {group: [readings]} in the order the groups are listed above, Other last
+    order = list(SENSOR_GROUPS.values()) + ["Other"]
+    grouped = {}
+    for reading in readings:
+        grouped.setdefault(reading.group, []).append(reading)
+    return {group: grouped[group] for group in order if group in grouped}
@@ -0,0 +1,136 @@
+import time
+from discord.ext import tasks
+
+
+class StateSnapshot:
+    def __init__(self):
+        self.host_power = None  # True/False as reported by IPMI, None if unknown
+        self.proxmox_ready = None
+        self.node_response = None  # Last successful /nodes/{node}/status response
+        self.vm_states = {}  # vm_id -> Proxmox status string
+        self.updated_at = None
+
+    def age(self):
+        if self.updated_at is None:
+            return float("inf")
+        return time.monotonic() - self.updated_at
+
+
+class StateWatcher:
+    # Keeps an in-memory snapshot of host power, Proxmox readiness and VM states.
+    # Polls quickly while something is changing and slowly once everything settles.
+    def __init__(self, read_host_power, read_node_status, read_vm_statuses, on_change,
+                 fast_interval=5, slow_interval=30, settle_polls=6, max_age=45, expectation_ttl=300):
+        self.read_host_power = read_host_power
+        self.read_node_status = read_node_status
+        self.read_vm_statuses = read_vm_statuses
+        self.on_change = on_change
+        self.fast_interval = fast_interval
+        self.slow_interval = slow_interval
+        self.settle_polls = settle_polls
+        self.max_age = max_age
+        self.expectation_ttl = expectation_ttl
+        self.snapshot = StateSnapshot()
+        self._expected = {}  # key -> (value, expires_at), changes the bot made itself
+        self._fast_polls_left = 0
+        self.loop = tasks.loop(seconds=slow_interval)(self._poll)
+
+    def start(self):
+        if not self.loop.is_running():
+            self.loop.start()
+
+    def stop(self):
+        self.loop.cancel()
+
+    def is_fresh(self):
+        return self.snapshot.age() <= self.max_age
+
+    def expect(self, key, value):
+        # Record a change the bot is about to make so it isn't reported as external,
+        # and poll fast until it shows up.
+        self._expected[key] = (value, time.monotonic() + self.expectation_ttl)
+        self.hurry()
+
+    def forget_vm(self, vm_id):
+        # The next poll records the VM afresh without comparing, so an expectation
+        # for it would never be met and would keep the loop fast until it expires
+        self.snapshot.vm_states.pop(str(vm_id), None)
+        self._expected.pop(("vm", str(vm_id)), None)
+
+    def hurry(self):
+        self._fast_polls_left = self.settle_polls
+        if self.loop.is_running() and self.loop.seconds != self.fast_interval:
+            self.loop.change_interval(seconds=self.fast_interval)
+
+    def _was_expected(self, key, value):
+        expected = self._expected.get(key)
+        if expected is None:
+            return False
+        if expected[1] < time.monotonic():
+            del self._expected[key]
+            return False
+        if expected[0] == value:
+            del self._expected[key]
+            return True
+        return False
+
+    async def _poll(self):
+        try:
+            await self._refresh()
+        except Exception as e:
+            print(f"Error in state watcher: {str(e)}")
+
+        now = time.monotonic()
+        self._expected = {key: value for key, value in self._expected.items() if value[1] >= now}
+        if self._expected:
+            self._fast_polls_left = max(self._fast_polls_left, 1)
+
+        if self._fast_polls_left > 0:
+            self._fast_polls_left -= 1
+            interval = self.fast_interval
+        else:
+            interval = self.slow_interval
+        if self.loop.seconds != interval:
+            self.loop.change_interval(seconds=interval)
+
+    async def _refresh(self):
+        host_power = await self.read_host_power()
+
+        node_response = None
+        if host_power is not False:
+            node_response = await self.read_node_status()
+        proxmox_ready = node_response is not None
+
+        vm_states = {}
+        if proxmox_ready:
+            vm_states = await self.read_vm_statuses() or {}
+
+        previous = self.snapshot
+        snapshot = StateSnapshot()
+        snapshot.host_power = host_power
+        snapshot.proxmox_ready = proxmox_ready
+        snapshot.node_response = node_response
+        snapshot.vm_states = {vm_id: status for vm_id, status in vm_states.items() if status}
+        snapshot.updated_at = time.monotonic()
+        self.snapshot = snapshot
+
+        if previous.updated_at is None:
+            return  # Nothing to compare against on the first poll
+
+        changes = []
+        if host_power is not None and previous.host_power is not None and host_power != previous.host_power:
+            changes.append(("host", previous.host_power, host_power))
+        if proxmox_ready != previous.proxmox_ready:
+            changes.append(("proxmox", previous.proxmox_ready, proxmox_ready))
+        for vm_id, status in snapshot.vm_states.items():
+            old_status = previous.vm_states.get(vm_id)
+            if old_status and old_status != status:
+                changes.append((("vm", vm_id), old_status, status))
+
+        # Host powered on but Proxmox not up yet (or the reverse): something is in motion
+        transitioning = host_power is not None and host_power != proxmox_ready
+        if changes or transitioning:
+            self._fast_polls_left = self.settle_polls
+
+        for key, old, new in changes:
+            await self.on_change(key, old, new, self._was_expected(key, new))
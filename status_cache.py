@@ -0,0 +1,66 @@
+import asyncio
+import time
+
+
+class StatusCache:
+    # Short-lived cache for Proxmox status lookups. Concurrent callers asking for
+    # the same key while a request is outstanding all await that one request.
+    def __init__(self):
+        self._entries = {}  # key -> (expires_at, value)
+        self._inflight = {}  # key -> asyncio.Task
+        self._generations = {}  # key -> bumped on invalidation, older fetches aren't stored
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+
+    async def get(self, key, ttl, fetch, should_cache=None):
+        entry = self._entries.get(key)
+        if entry is not None:
+            if entry[0] > time.monotonic():
+                self.hits += 1
+                return entry[1]
+            del self._entries[key]
+
+        task = self._inflight.get(key)
+        if task is None:
+            self.misses += 1
+            task = asyncio.ensure_future(self._fetch(key, ttl, fetch, should_cache, self._generations.get(key, 0)))
+            self._inflight[key] = task
+        else:
+            self.coalesced += 1
+
+        # Shielded so one caller giving up doesn't cancel the request for the others
+        return await asyncio.shield(task)
+
+    async def _fetch(self, key, ttl, fetch, should_cache, generation):
+        try:
+            value = await fetch()
+            # A fetch that started before an invalidation may hold the old state, it isn't stored
+            current = self._generations.get(key, 0) == generation
+            if current and ttl > 0 and (should_cache is None or should_cache(value)):
+                self._entries[key] = (time.monotonic() + ttl, value)
+            return value
+        finally:
+            if self._generations.get(key, 0) == generation:
+                self._inflight.pop(key, None)
+
+    def invalidate(self, *keys):
+        # Later callers start a new request instead of joining one that is already out
+        for key in keys:
+            self._entries.pop(key, None)
+            if self._inflight.pop(key, None) is not None:
+                self._generations[key] = self._generations.get(key, 0) + 1
+
+    def clear(self):
+        self._entries.clear()
+        self.invalidate(*list(self._inflight))
+
+    def stats(self):
+        lookups = self.hits + self.misses + self.coalesced
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "api_calls_saved": self.hits + self.coalesced,
+            "hit_ratio": (self.hits + self.coalesced) / lookups if lookups else 0.0,
+        }
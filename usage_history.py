@@ -0,0 +1,159 @@
+import asyncio
+import datetime
+import sqlite3
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS demand (
+    ts INTEGER NOT NULL,
+    user_id TEXT NOT NULL,
+    command TEXT NOT NULL,
+    host_was_on INTEGER
+);
+CREATE INDEX IF NOT EXISTS demand_ts ON demand (ts);
+CREATE TABLE IF NOT EXISTS prewarm (
+    id INTEGER PRIMARY KEY,
+    ts INTEGER NOT NULL,
+    slot_weekday INTEGER NOT NULL,
+    slot_hour INTEGER NOT NULL,
+    probability REAL NOT NULL,
+    hit_ts INTEGER,
+    saved_seconds REAL
+);
+"""
+
+
+class UsageHistory:
+    # Command history in SQLite. Demand events are buffered in memory and
+    # written in batches; all database work runs on one worker thread so the
+    # event loop never waits on disk.
+    def __init__(self, path, flush_interval=60, batch_size=100):
+        self.path = path
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self._pending = []  # (ts, user_id, command, host_was_on)
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="usage-db")
+        self._db = None
+        self._task = None
+
+    # Worker thread side
+
+    def _connect(self):
+        if self._db is None:
+            self._db = sqlite3.connect(self.path, check_same_thread=False)
+            self._db.executescript(SCHEMA)
+        return self._db
+
+    def _write_demand(self, rows):
+        db = self._connect()
+        with db:
+            db.executemany("INSERT INTO demand (ts, user_id, command, host_was_on) VALUES (?, ?, ?, ?)", rows)
+
+    def _execute(self, query, params=(), fetch=False):
+        db = self._connect()
+        with db:
+            cursor = db.execute(query, params)
+            return cursor.fetchall() if fetch else cursor.lastrowid
+
+    # Event loop side
+
+    async def _run_db(self, function, *args):
+        return await asyncio.get_running_loop().run_in_executor(self._executor, function, *args)
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._flush_loop())
+
+    async def _flush_loop(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
+
+    def record_demand(self, user_id, command, host_was_on):
+        self._pending.append((int(time.time()), str(user_id), command,
+                              None if host_was_on is None else int(bool(host_was_on))))
+        if len(self._pending) >= self.batch_size:
+            asyncio.ensure_future(self.flush())
+
+    async def flush(self):
+        rows, self._pending = self._pending, []
+        if not rows:
+            return
+        try:
+            await self._run_db(self._write_demand, rows)
+        except sqlite3.Error as e:
+            print(f"Failed to write usage history to {self.path}: {str(e)}")
+            self._pending = rows + self._pending
+
+    async def demand_histogram(self, weeks):
+        # {(weekday, hour): share of the observed weeks with demand in that hour}.
+        # weekday is 0 for Monday, like datetime.weekday().
+        await self.flush()
+        since = int(time.time()) - weeks * 7 * 86400
+        rows = await self._run_db(self._execute, "SELECT ts FROM demand WHERE ts >= ? ORDER BY ts", (since,), True)
+        if not rows:
+            return {}, 0
+        days_with_demand = {}
+        for (ts,) in rows:
+            moment = datetime.datetime.fromtimestamp(ts)
+            days_with_demand.setdefault((moment.weekday(), moment.hour), set()).add(moment.date())
+        observed_weeks = max(1, min(weeks, -(-(int(time.time()) - rows[0][0]) // (7 * 86400))))
+        histogram = {slot: min(len(days) / observed_weeks, 1.0) for slot, days in days_with_demand.items()}
+        return histogram, observed_weeks
+
+    async def record_prewarm(self, slot, probability):
+        return await self._run_db(
+            self._execute, "INSERT INTO prewarm (ts, slot_weekday, slot_hour, probability) VALUES (?, ?, ?, ?)",
+            (int(time.time()), slot[0], slot[1], probability))
+
+    async def record_prewarm_hit(self, prewarm_id, saved_seconds):
+        await self._run_db(self._execute, "UPDATE prewarm SET hit_ts = ?, saved_seconds = ? WHERE id = ? AND hit_ts IS NULL",
+                           (int(time.time()), saved_seconds, prewarm_id))
+
+    async def prewarms_since(self, since):
+        rows = await self._run_db(self._execute, "SELECT COUNT(*) FROM prewarm WHERE ts >= ?", (int(since),), True)
+        return rows[0][0]
+
+    async def prewarm_report(self):
+        rows = await self._run_db(
+            self._execute, "SELECT COUNT(*), COUNT(hit_ts), COALESCE(SUM(saved_seconds), 0) FROM prewarm", (), True)
+        total, hits, saved_seconds = rows[0]
+        return {
+            "prewarms": total,
+            "hits": hits,
+            "hit_rate": hits / total if total else 0.0,
+            "minutes_saved": saved_seconds / 60,
+        }
+
+    async def close(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        await self.flush()
+        if self._db is not None:
+            await self._run_db(self._db.close)
+            self._db = None
+        self._executor.shutdown(wait=False)
+
+
+class PrewarmPlanner:
+    # Picks the hour to boot for: the next hour whose demand share is at least
+    # min_probability, once we are within lead_time seconds of it.
+    def __init__(self, min_probability=0.5, min_weeks=2):
+        self.min_probability = min_probability
+        self.min_weeks = min_weeks
+
+    def due_slot(self, histogram, observed_weeks, lead_time, now=None):
+        # Returns ((weekday, hour), probability) or None
+        if observed_weeks < self.min_weeks:
+            return None
+        now = now or datetime.datetime.now()
+        next_hour = now.replace(minute=0, second=0, microsecond=0) + datetime.timedelta(hours=1)
+        if (next_hour - now).total_seconds() > lead_time:
+            return None
+        slot = (next_hour.weekday(), next_hour.hour)
+        probability = histogram.get(slot, 0.0)
+        if probability < self.min_probability:
+            return None
+        return slot, probability
@@ -0,0 +1,68 @@
+import asyncio
+import time
+
+
+class VmNodeIndex:
+    # Maps each vmid to the cluster node it currently lives on, built from
+    # /cluster/resources listings. Entries are refreshed when they get old,
+    # when a vmid is unknown, or when a request shows the VM has moved.
+    def __init__(self, fetch_resources, ttl=300, retry_after=60):
+        self.fetch_resources = fetch_resources  # async, returns the listing or None
+        self.ttl = ttl
+        self.retry_after = retry_after  # seconds between attempts while the listing fails
+        self._nodes = {}  # vm_id -> node
+        self._refreshed_at = 0.0
+        self._failed_at = None
+        self._refresh_task = None
+
+    def update(self, resources):
+        # Apply a listing as a diff so only moved, new or removed VMs change
+        seen = set()
+        for resource in resources:
+            if resource.get("type") not in (None, "qemu") or resource.get("vmid") is None:
+                continue
+            vm_id = str(resource["vmid"])
+            node = resource.get("node")
+            seen.add(vm_id)
+            old_node = self._nodes.get(vm_id)
+            if old_node != node:
+                if old_node is not None:
+                    print(f"VM {vm_id} moved from {old_node} to {node}")
+                self._nodes[vm_id] = node
+        for vm_id in set(self._nodes) - seen:
+            del self._nodes[vm_id]
+        self._refreshed_at = time.monotonic()
+
+    def is_stale(self):
+        return time.monotonic() - self._refreshed_at > self.ttl
+
+    def backing_off(self):
+        # The listing failed recently (e.g. the token may not read /cluster/resources),
+        # asking again before every VM request would only double the calls
+        return self._failed_at is not None and time.monotonic() - self._failed_at < self.retry_after
+
+    async def refresh(self):
+        # Concurrent refreshes share one listing
+        if self._refresh_task is None or self._refresh_task.done():
+            self._refresh_task = asyncio.ensure_future(self.fetch_resources())
+        try:
+            resources = await asyncio.shield(self._refresh_task)
+        except Exception:
+            self._failed_at = time.monotonic()
+            raise
+        self._failed_at = None if resources is not None else time.monotonic()
+
+    async def node_for(self, vm_id, refresh=False):
+        vm_id = str(vm_id)
+        if (refresh or vm_id not in self._nodes or self.is_stale()) and not self.backing_off():
+            try:
+                await self.refresh()
+            except Exception as e:
+                print(f"Failed to refresh the VM node index: {str(e)}")
+        return self._nodes.get(vm_id)
+
+    def cached_node(self, vm_id):
+        return self._nodes.get(str(vm_id))
+
+    def invalidate(self, vm_id):
+        self._nodes.pop(str(vm_id), None)
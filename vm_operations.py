@@ -0,0 +1,163 @@
+import asyncio
+import heapq
+import itertools
+import time
+from proxmox_client import ProxmoxConnectionError
+
+
+def upid_node(upid):
+    # UPID:<node>:<pid>:<pstart>:<starttime>:<type>:<id>:<user>:
+    parts = upid.split(":")
+    return parts[1] if len(parts) > 1 else None
+
+
+class TaskTracker:
+    # Follows Proxmox tasks (UPIDs) until they finish. One poller serves every
+    # outstanding task; each task is polled quickly at first and backs off the
+    # longer it runs.
+    def __init__(self, fetch_task_status, min_interval=1, max_interval=10, timeout=600):
+        self.fetch_task_status = fetch_task_status  # async (node, upid) -> task status dict
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.timeout = timeout
+        self._heap = []  # (poll_at, seq, entry)
+        self._seq = itertools.count()
+        self._wakeup = asyncio.Event()
+        self._task = None
+
+    def tracked(self):
+        return len(self._heap)
+
+    def track(self, upid, node=None):
+        future = asyncio.get_running_loop().create_future()
+        entry = {
+            "upid": upid,
+            "node": node or upid_node(upid),
+            "future": future,
+            "deadline": time.monotonic() + self.timeout,
+            "delay": self.min_interval,
+        }
+        heapq.heappush(self._heap, (time.monotonic() + self.min_interval, next(self._seq), entry))
+        self._wakeup.set()
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+        return future
+
+    async def _run(self):
+        # Exits once nothing is tracked, track() starts it again
+        while self._heap:
+            delay = self._heap[0][0] - time.monotonic()
+            if delay > 0:
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), delay)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            due = []
+            now = time.monotonic()
+            while self._heap and self._heap[0][0] <= now:
+                due.append(heapq.heappop(self._heap)[2])
+            results = await asyncio.gather(*(self._poll(entry) for entry in due), return_exceptions=True)
+
+            for entry, result in zip(due, results):
+                if entry["future"].done():
+                    continue
+                if isinstance(result, dict) and result.get("status") == "stopped":
+                    entry["future"].set_result(result.get("exitstatus", ""))
+                elif time.monotonic() >= entry["deadline"]:
+                    entry["future"].set_result("timeout")
+                else:
+                    entry["delay"] = min(self.max_interval, entry["delay"] * 1.5)
+                    heapq.heappush(self._heap, (time.monotonic() + entry["delay"], next(self._seq), entry))
+
+    async def _poll(self, entry):
+        return await self.fetch_task_status(entry["node"], entry["upid"])
+
+
+class VmOperation:
+    def __init__(self, vm_id, action):
+        self.vm_id = vm_id
+        self.action = action
+        self.task = None
+        self.upid = None
+        self.node = None
+        self.exitstatus = None
+        self.error = None
+        self.queued_at = time.monotonic()
+        self.started_at = None
+        self.duration = None
+        self.duplicates = 0
+
+    @property
+    def ok(self):
+        return self.error is None and self.exitstatus == "OK"
+
+    def describe_failure(self):
+        if self.error:
+            return self.error
+        if self.exitstatus == "timeout":
+            return "the task did not finish in time"
+        return self.exitstatus or "unknown error"
+
+
+class VmOperationQueue:
+    # Runs power actions per VM one after another. Asking for an action that is
+    # already queued or running for that VM joins it instead of sending it again.
+    def __init__(self, send_action, tracker):
+        self.send_action = send_action  # async (vm_id, action) -> ProxmoxResponse
+        self.tracker = tracker
+        self._operations = {}  # vm_id -> [VmOperation], running one first
+
+    def pending(self, vm_id=None):
+        if vm_id is not None:
+            return list(self._operations.get(str(vm_id), []))
+        return [operation for operations in self._operations.values() for operation in operations]
+
+    def submit(self, vm_id, action):
+        # Returns (operation, is_new)
+        vm_id = str(vm_id)
+        operations = self._operations.setdefault(vm_id, [])
+        previous = operations[-1] if operations else None
+        # Only the last queued action counts: start, shutdown, start must still run all three
+        if previous is not None and previous.action == action:
+            previous.duplicates += 1
+            return previous, False
+
+        operation = VmOperation(vm_id, action)
+        operation.task = asyncio.ensure_future(self._execute(operation, previous))
+        operations.append(operation)
+        return operation, True
+
+    async def _execute(self, operation, previous):
+        try:
+            if previous is not None:
+                await asyncio.wait([previous.task])
+            operation.started_at = time.monotonic()
+
+            response = await self.send_action(operation.vm_id, operation.action)
+            if response.status_code != 200:
+                operation.error = f"Error: {response.status_code}, Response: {response.text}"
+                return operation
+
+            operation.upid = response.data
+            if not isinstance(operation.upid, str):
+                # Nothing to follow, Proxmox accepted the request and that is all we know
+                operation.exitstatus = "OK"
+                return operation
+            operation.node = upid_node(operation.upid)
+            operation.exitstatus = await self.tracker.track(operation.upid, operation.node)
+        except ProxmoxConnectionError as e:
+            operation.error = f"failed to reach Proxmox: {e}"
+        except Exception as e:
+            print(f"Error while running {operation.action} for VM {operation.vm_id}: {str(e)}")
+            operation.error = str(e)
+        finally:
+            operation.duration = time.monotonic() - (operation.started_at or operation.queued_at)
+            operations = self._operations.get(operation.vm_id, [])
+            if operation in operations:
+                operations.remove(operation)
+            if not operations:
+                self._operations.pop(operation.vm_id, None)
+        return operation